@@ -1,30 +1,93 @@
 import re
-import boto3
-from dotenv import load_dotenv
 import os
-import uuid
+import json
+import random
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-import faker
 
-load_dotenv()
+from archivos import escribir_json_atomico
+from clientes import cargar_entorno, obtener_cliente, obtener_sesion
+from control_ritmo import ClienteConRitmo, ThrottlingExterno, clave_s3, ejecutar
+from instrumentacion import medir_espera
 
-session = boto3.Session(
-    aws_access_key_id=os.getenv("ACCESS_KEY"),
-    aws_secret_access_key=os.getenv("SECRET_KEY"),
-    aws_session_token=os.getenv("SESSION_TOKEN"),
-    region_name=os.getenv("REGION"),
-)
 
+def contar_instancias():
+    """Contar las instancias EC2 de la cuenta"""
+    response = obtener_cliente("ec2").describe_instances()
+
+    instance_count = sum(
+        len(reservation["Instances"]) for reservation in response["Reservations"]
+    )
+
+    print(f"Número de instancias EC2 actual: {instance_count}")
+    return instance_count
+
+
+# --------------------------------
+# Perfiles de rendimiento para volúmenes EBS
+# --------------------------------
+
+# Parámetros de create_volume por perfil. Los valores de IOPS y throughput
+# (MiB/s) se usan también como referencia al comprobar el benchmark.
+PERFILES_EBS = {
+    "gp3": {"VolumeType": "gp3", "Iops": 3000, "Throughput": 125},
+    "gp3-alto": {"VolumeType": "gp3", "Iops": 16000, "Throughput": 1000},
+    "io2": {"VolumeType": "io2", "Iops": 2000},
+    "st1": {"VolumeType": "st1"},
+}
+
+# Tamaño mínimo (GiB) admitido por cada tipo de volumen
+TAMANO_MINIMO_EBS = {"gp3": 1, "io2": 4, "st1": 125}
+
+# IOPS provisionadas máximas por GiB (los tipos que no aparecen no admiten Iops)
+IOPS_POR_GIB_EBS = {"gp3": 500, "io2": 500}
+# gp3 incluye 3000 IOPS y 125 MiB/s sea cual sea el tamaño; por encima, como
+# mucho 0,25 MiB/s por IOPS provisionada
+IOPS_BASE_GP3 = 3000
+THROUGHPUT_BASE_GP3 = 125
+MIB_S_POR_IOPS_GP3 = 0.25
+
+# Fracción del espacio libre del volumen que ocupa el archivo de prueba de fio,
+# con un tope: fio escribe el archivo entero antes de medir las lecturas
+FRACCION_ARCHIVO_FIO = 0.6
+MAX_ARCHIVO_FIO_MB = 4096
 
-ec2 = session.client("ec2")
+# Pruebas de fio: (nombre, modo, tamaño de bloque, profundidad de cola)
+PRUEBAS_FIO = [
+    ("lectura_secuencial", "read", "1M", 16),
+    ("escritura_secuencial", "write", "1M", 16),
+    ("lectura_aleatoria", "randread", "4k", 32),
+    ("escritura_aleatoria", "randwrite", "4k", 32),
+]
 
-response = ec2.describe_instances()
+resultados_folder = './resultados_ebs'
 
-instance_count = sum(
-    len(reservation["Instances"]) for reservation in response["Reservations"]
+# Opciones NFS orientadas a throughput para EFS: bloques de 1 MiB, varias
+# conexiones TCP por montaje y caché de atributos más larga
+OPCIONES_MONTAJE_EFS = (
+    "nfsvers=4.1,rsize=1048576,wsize=1048576,hard,timeo=600,retrans=2,"
+    "noresvport,nconnect=16,actimeo=30"
 )
 
-print(f"Número de instancias EC2 actual: {instance_count}")
+# Token estable para reutilizar el mismo EFS entre ejecuciones e instancias
+EFS_CREATION_TOKEN = "gestion-practicas-efs"
+
+# Caché local de sistemas EFS: token -> ID y estado
+efs_cache_file = './.cache_efs.json'
+
+# Read-ahead (KiB) recomendado para clientes NFS de EFS con lecturas grandes
+READ_AHEAD_EFS_KB = 15360
+
+# Carga de datos de S3 en volúmenes montados
+manifiestos_folder = './manifiestos_carga'
+TAMANO_RANGO_CARGA = 8 * 1024 * 1024
+# Canales simultáneos por conexión SSH (MaxSessions por defecto de sshd)
+MAX_CANALES_SSH = 10
+# Vigencia de las URLs prefirmadas: se firma una por rango justo antes de usarla
+VIGENCIA_URL_RANGO = 900
 
 
 # --------------------------------
@@ -32,6 +95,14 @@ print(f"Número de instancias EC2 actual: {instance_count}")
 # --------------------------------
 
 class EC2Manager:
+    # Tabla de reservas de devices por instancia, compartida entre hilos para
+    # que dos asignaciones concurrentes no elijan la misma letra /dev/sdX. La
+    # reserva dura mientras el volumen siga asignado: describe_instances es
+    # eventualmente consistente y puede no mostrar aún una asignación reciente
+    _devices_reservados = {}
+    _lock_devices = threading.Lock()
+    _lock_cache_efs = threading.Lock()
+
     def __init__(
         self,
         ami_id,
@@ -39,17 +110,29 @@ class EC2Manager:
         key_name=None,
         instance_name="test-instance",
     ):
+        cargar_entorno()
         self.ami_id = ami_id
         self.instance_type = instance_type
         self.key_name = key_name or os.getenv("PEM_NAME")
         self.instance_name = instance_name
         self.instance_id = None
         self.instance_region = None
+        self.resultados_rendimiento = {}
+
+    @property
+    def ec2(self):
+        """Cliente EC2 compartido, con las llamadas sujetas al control de ritmo"""
+        return ClienteConRitmo(obtener_cliente("ec2"), "ec2")
+
+    @property
+    def efs(self):
+        """Cliente EFS compartido, con las llamadas sujetas al control de ritmo"""
+        return ClienteConRitmo(obtener_cliente("efs"), "efs")
 
     def crear_instancia(self):
         """Crear una instancia EC2"""
         print(self.key_name)
-        response = ec2.run_instances(
+        response = self.ec2.run_instances(
             ImageId=self.ami_id,
             InstanceType=self.instance_type,
             MinCount=1,
@@ -68,32 +151,52 @@ class EC2Manager:
         return self.instance_id or instance_id
 
     def _find_free_device(self, instance_id):
-        description = ec2.describe_instances(InstanceIds=[instance_id])
+        """Reservar el primer device /dev/sdX libre de la instancia"""
+        # Los devices en uso según EC2 se combinan con las reservas dentro del
+        # lock, así que una descripción desfasada no hace repetir una letra
+        description = self.ec2.describe_instances(InstanceIds=[instance_id])
         instance_data = description["Reservations"][0]["Instances"][0]
         used_devices = {
             mapping.get("DeviceName")
             for mapping in instance_data.get("BlockDeviceMappings", [])
             if mapping.get("DeviceName")
         }
-        for letter in "fghijklmnop":
-            device_name = f"/dev/sd{letter}"
-            if device_name not in used_devices:
-                return device_name
+        with EC2Manager._lock_devices:
+            reservados = EC2Manager._devices_reservados.setdefault(instance_id, set())
+            for letter in "fghijklmnop":
+                device_name = f"/dev/sd{letter}"
+                if device_name not in used_devices and device_name not in reservados:
+                    reservados.add(device_name)
+                    return device_name
         raise ValueError("No hay device libre disponible para adjuntar el volumen EBS.")
 
+    def _reservar_device(self, instance_id, device):
+        """Reservar un device elegido por quien llama (falla si ya está reservado)"""
+        with EC2Manager._lock_devices:
+            reservados = EC2Manager._devices_reservados.setdefault(instance_id, set())
+            if device in reservados:
+                raise ValueError(f"El device {device} ya está reservado en la instancia {instance_id}.")
+            reservados.add(device)
+        return device
+
+    def _liberar_device(self, instance_id, device):
+        """Liberar la reserva de un device (si falla la asignación o tras desasignar el volumen)"""
+        with EC2Manager._lock_devices:
+            EC2Manager._devices_reservados.get(instance_id, set()).discard(device)
+
     def parar_instancia(self, instance_id=None):
         """Parar la instancia EC2"""
         self._get_instance_id(instance_id)
         instance_id = self.instance_id or instance_id
-        ec2.stop_instances(InstanceIds=[instance_id])
+        self.ec2.stop_instances(InstanceIds=[instance_id])
         print(f"Instancia {instance_id} detenida.")
-        self.esperar_estado("stopped")
+        self.esperar_estado("stopped", instance_id=instance_id)
 
     def obtener_region(self, instance_id=None):
         """Obtener la zona de disponibilidad de la instancia"""
         self._get_instance_id(instance_id)
         instance_id = self.instance_id or instance_id
-        description = ec2.describe_instances(InstanceIds=[instance_id])
+        description = self.ec2.describe_instances(InstanceIds=[instance_id])
         self.instance_region = description["Reservations"][0]["Instances"][0][
             "Placement"
         ]["AvailabilityZone"]
@@ -104,7 +207,7 @@ class EC2Manager:
         """Aplicar etiqueta 'Name' a la instancia"""
         self._get_instance_id(instance_id)
         instance_id = self.instance_id or instance_id
-        ec2.create_tags(
+        self.ec2.create_tags(
             Resources=[instance_id],
             Tags=[{"Key": "Name", "Value": tag or self.instance_name}],
         )
@@ -114,8 +217,9 @@ class EC2Manager:
         """Esperar a que la instancia llegue a un estado específico"""
         self._get_instance_id(instance_id)
         instance_id = self.instance_id or instance_id
-        waiter = ec2.get_waiter(f"instance_{estado}")
-        waiter.wait(InstanceIds=[instance_id])
+        waiter = self.ec2.get_waiter(f"instance_{estado}")
+        with medir_espera(f"ec2.instance_{estado}"):
+            waiter.wait(InstanceIds=[instance_id])
         print(f"Instancia {instance_id} está en estado '{estado}'.")
 
     def eliminar_instancia(self, instance_id=None):
@@ -123,15 +227,59 @@ class EC2Manager:
         self._get_instance_id(instance_id)
         instance_id = self.instance_id or instance_id
 
-        ec2.stop_instances(InstanceIds=[instance_id])
+        self.ec2.stop_instances(InstanceIds=[instance_id])
         print(f"Instancia {instance_id} detenida.")
         self.esperar_estado("stopped", instance_id=instance_id)
 
-        ec2.terminate_instances(InstanceIds=[instance_id])
+        self.ec2.terminate_instances(InstanceIds=[instance_id])
+        with EC2Manager._lock_devices:
+            EC2Manager._devices_reservados.pop(instance_id, None)
         print(f"Instancia {instance_id} eliminada.")
 
+    def _parametros_volumen(self, size_gb, perfil="gp3", iops=None, throughput=None):
+        """Construir los parámetros de create_volume para un perfil de rendimiento"""
+        if perfil not in PERFILES_EBS:
+            raise ValueError(
+                f"Perfil EBS desconocido: {perfil}. Opciones: {', '.join(PERFILES_EBS)}"
+            )
+        parametros = dict(PERFILES_EBS[perfil])
+        if iops:
+            parametros["Iops"] = iops
+        if throughput:
+            parametros["Throughput"] = throughput
+        tipo = parametros["VolumeType"]
+        minimo = TAMANO_MINIMO_EBS[tipo]
+        if size_gb < minimo:
+            raise ValueError(
+                f"Los volúmenes {tipo} requieren al menos {minimo} GiB."
+            )
+        if "Iops" in parametros:
+            if tipo not in IOPS_POR_GIB_EBS:
+                raise ValueError(f"Los volúmenes {tipo} no admiten IOPS provisionadas.")
+            maximo = IOPS_POR_GIB_EBS[tipo] * size_gb
+            if tipo == "gp3":
+                maximo = max(maximo, IOPS_BASE_GP3)
+            if parametros["Iops"] > maximo:
+                raise ValueError(
+                    f"{parametros['Iops']} IOPS superan el máximo de {IOPS_POR_GIB_EBS[tipo]} IOPS/GiB "
+                    f"de {tipo}: con {size_gb} GiB se admiten {maximo} "
+                    f"(hacen falta {-(-parametros['Iops'] // IOPS_POR_GIB_EBS[tipo])} GiB)."
+                )
+        if "Throughput" in parametros:
+            if tipo != "gp3":
+                raise ValueError("Solo los volúmenes gp3 admiten throughput provisionado.")
+            maximo = max(THROUGHPUT_BASE_GP3, parametros.get("Iops", IOPS_BASE_GP3) * MIB_S_POR_IOPS_GP3)
+            if parametros["Throughput"] > maximo:
+                raise ValueError(
+                    f"{parametros['Throughput']} MiB/s superan el máximo de gp3 con "
+                    f"{parametros.get('Iops', IOPS_BASE_GP3)} IOPS ({maximo:.0f} MiB/s)."
+                )
+        parametros["Size"] = size_gb
+        return parametros
+
     def crear_volumen_ebs(
-        self, size_gb=1, instance_region=None, zona_disponibilidad=None
+        self, size_gb=1, instance_region=None, zona_disponibilidad=None,
+        perfil="gp3", iops=None, throughput=None,
     ):
         """Crear un volumen EBS en la misma zona de disponibilidad que la instancia"""
         if not self.instance_region and not instance_region and not zona_disponibilidad:
@@ -139,19 +287,18 @@ class EC2Manager:
                 "Debes proporcionar la zona de disponibilidad (ej: 'us-east-1a')."
             )
         region = zona_disponibilidad or self.instance_region or instance_region
-        volume = ec2.create_volume(
+        volume = self.ec2.create_volume(
             AvailabilityZone=region,
-            Size=size_gb,
-            VolumeType="gp3",
+            **self._parametros_volumen(size_gb, perfil, iops, throughput),
         )
         volume_id = volume["VolumeId"]
-        print(f"\nVolumen EBS creado con ID: {volume_id}")
+        print(f"\nVolumen EBS creado con ID: {volume_id} (perfil {perfil})")
         return volume_id
-    
+
     def obtener_ip_publica(self, instance_id=None):
         self._get_instance_id(instance_id)
         instance_id = self.instance_id or instance_id
-        description = ec2.describe_instances(InstanceIds=[instance_id])
+        description = self.ec2.describe_instances(InstanceIds=[instance_id])
         instance_data = description["Reservations"][0]["Instances"][0]
         public_ip = instance_data.get("PublicIpAddress") or os.getenv("INSTANCE_IP")
         print(f"IP pública de la instancia {instance_id}: {public_ip}")
@@ -163,23 +310,47 @@ class EC2Manager:
         """Asignar un volumen EBS a la instancia"""
         self._get_instance_id(instance_id)
         instance_id = self.instance_id or instance_id
-        device = device or self._find_free_device(instance_id)
-        ec2.attach_volume(
-            VolumeId=volume_id,
-            InstanceId=instance_id,
-            Device=device,
-        )
+        if device:
+            self._reservar_device(instance_id, device)
+        else:
+            device = self._find_free_device(instance_id)
+        try:
+            self.ec2.attach_volume(
+                VolumeId=volume_id,
+                InstanceId=instance_id,
+                Device=device,
+            )
+        except Exception:
+            # La reserva solo se libera si la asignación no llega a hacerse
+            self._liberar_device(instance_id, device)
+            raise
         print(f"Volumen {volume_id} asignado a la instancia {instance_id} en {device}.")
         return device
 
-    def montar_volumen_ebs_en_instancia(
-        self,
-        instance_ip,
-        device="/dev/xvdf",
-        mount_point="/mnt/ebs_volume",
-        username="ec2-user",
-    ):
-        """Montar el volumen EBS en la instancia (requiere acceso SSH)"""
+    def _esperar_asignacion(self, volume_id):
+        """Esperar a que el volumen figure como asignado a la instancia"""
+        with medir_espera("ec2.volume_in_use"):
+            self.ec2.get_waiter("volume_in_use").wait(
+                VolumeIds=[volume_id],
+                Filters=[{"Name": "attachment.status", "Values": ["attached"]}],
+            )
+
+    def _descartar_volumen(self, volume_id, instance_id=None, device=None):
+        """Desasignar (si llegó a asignarse) y eliminar un volumen cuyo aprovisionamiento falló"""
+        try:
+            if instance_id:
+                self.ec2.detach_volume(VolumeId=volume_id, InstanceId=instance_id)
+                with medir_espera("ec2.volume_available"):
+                    self.ec2.get_waiter("volume_available").wait(VolumeIds=[volume_id])
+                # Ya desasignado: el device vuelve a estar libre
+                self._liberar_device(instance_id, device)
+            self.ec2.delete_volume(VolumeId=volume_id)
+            print(f"Volumen {volume_id} eliminado tras el error.")
+        except Exception as e:
+            print(f"AVISO: no se pudo eliminar el volumen {volume_id}: {e}")
+
+    def _conectar_ssh(self, instance_ip, username="ec2-user"):
+        """Abrir una conexión SSH con la instancia usando la clave PEM configurada"""
         import paramiko
 
         ssh = paramiko.SSHClient()
@@ -190,8 +361,44 @@ class EC2Manager:
         ssh.connect(
             hostname=instance_ip, username=username, pkey=key, port=22, timeout=10
         )
+        return ssh
 
-        # Comandos para formatear y montar el volumen
+    def _ejecutar_ssh(self, ssh, command):
+        """Ejecutar un comando remoto y devolver (código de salida, salida estándar)"""
+        stdin, stdout, stderr = ssh.exec_command(command)
+        output = stdout.read().decode()
+        exit_status = stdout.channel.recv_exit_status()  # Esperar a que el comando termine
+        return exit_status, output
+
+    def resolver_device_en_host(self, ssh, volume_id, device, intentos=30):
+        """Resolver en la instancia el device real (NVMe o xvd) de un volumen EBS"""
+        # En instancias Nitro el volumen aparece como /dev/nvmeXn1 con el ID del
+        # volumen (sin guion) como número de serie; en Xen como /dev/xvdX
+        serial = volume_id.replace("-", "")
+        candidatos = " ".join([
+            f"/dev/disk/by-id/nvme-Amazon_Elastic_Block_Store_{serial}",
+            device,
+            device.replace("/dev/sd", "/dev/xvd"),
+        ])
+        command = (
+            f"for i in $(seq 1 {intentos}); do "
+            f"d=$(lsblk -ndo NAME,SERIAL | awk '$2==\"{serial}\" {{print \"/dev/\"$1; exit}}'); "
+            f'if [ -n "$d" ]; then echo "$d"; exit 0; fi; '
+            f"for p in {candidatos}; do "
+            f'if [ -b "$p" ]; then readlink -f "$p"; exit 0; fi; '
+            f"done; sleep 1; done; exit 1"
+        )
+        exit_status, output = self._ejecutar_ssh(ssh, command)
+        if exit_status != 0 or not output.strip():
+            raise ValueError(
+                f"No se encontró en la instancia el device del volumen {volume_id} ({device})."
+            )
+        host_device = output.strip().splitlines()[0]
+        print(f"Volumen {volume_id} ({device}) resuelto en la instancia como {host_device}")
+        return host_device
+
+    def _formatear_y_montar(self, ssh, device, mount_point):
+        """Formatear el device en ext4 y montarlo en el punto de montaje"""
         commands = [
             f"sudo mkfs -t ext4 {device}",
             f"sudo mkdir -p {mount_point}",
@@ -200,174 +407,730 @@ class EC2Manager:
         ]
 
         for command in commands:
-            stdin, stdout, stderr = ssh.exec_command(command)
-            stdout.channel.recv_exit_status()  # Esperar a que el comando termine
+            exit_status, _ = self._ejecutar_ssh(ssh, command)
+            if exit_status != 0:
+                raise ValueError(
+                    f"Falló '{command}' en la instancia (código de salida {exit_status})."
+                )
             print(f"Ejecutado: {command}")
 
-        ssh.close()
+    def montar_volumen_ebs_en_instancia(
+        self,
+        instance_ip,
+        device="/dev/xvdf",
+        mount_point="/mnt/ebs_volume",
+        username="ec2-user",
+        volume_id=None,
+    ):
+        """Montar el volumen EBS en la instancia (requiere acceso SSH)"""
+        ssh = self._conectar_ssh(instance_ip, username)
+
+        # Si se conoce el volumen, resolver el device real en la instancia
+        if volume_id:
+            device = self.resolver_device_en_host(ssh, volume_id, device)
+
+        # Comandos para formatear y montar el volumen
+        self._formatear_y_montar(ssh, device, mount_point)
         print(f"Volumen montado en {mount_point} en la instancia {instance_ip}.")
-        
+
         # Agregar un archivo de prueba en el volumen montado
-        ssh.connect(
-            hostname=instance_ip, username=username, pkey=key, port=22, timeout=10
-        )
         test_file_command = f'echo "Prueba de almacenamiento en EBS" | sudo tee {mount_point}/prueba_ebs.txt'
-        stdin, stdout, stderr = ssh.exec_command(test_file_command)
-        stdout.channel.recv_exit_status()
+        self._ejecutar_ssh(ssh, test_file_command)
         print(f"Archivo de prueba creado en {mount_point}/prueba_ebs.txt")
-        
+
         # Leer el archivo de prueba para verificar
         read_file_command = f"sudo cat {mount_point}/prueba_ebs.txt"
-        stdin, stdout, stderr = ssh.exec_command(read_file_command)
-        output = stdout.read().decode()
+        _, output = self._ejecutar_ssh(ssh, read_file_command)
         print(f"Contenido del archivo de prueba: {output}")
-        
+
         ssh.close()
-        
-    def crear_efs_y_montar_en_instancia(self, instance_ip, instance_id=None, username="ec2-user"):
-        """Crear un sistema de archivos EFS, montarlo en la instancia y añadir un archivo de prueba"""
-        import paramiko
-        import time
 
-        # Crear EFS
-        efs = session.client("efs")
-        response = efs.create_file_system(CreationToken=str(uuid.uuid4()))
-        file_system_id = response["FileSystemId"]
-        print(f"\nEFS creado con ID: {file_system_id}")
+    def _provisionar_volumen(self, instancia, parametros, username, benchmark):
+        """Crear, esperar, asignar, formatear y montar un volumen en una instancia"""
+        instance_id = instancia["instance_id"]
+        volume = self.ec2.create_volume(AvailabilityZone=instancia["zona"], **parametros)
+        volume_id = volume["VolumeId"]
+        print(f"\nVolumen EBS creado con ID: {volume_id} para {instance_id}")
+
+        asignado = False
+        try:
+            with medir_espera("ec2.volume_available"):
+                self.ec2.get_waiter("volume_available").wait(VolumeIds=[volume_id])
 
-        # Esperar a que el EFS esté disponible (EFS no tiene waiter nativo, usamos polling)
-        max_attempts = 30
-        for attempt in range(max_attempts):
+            device = self._find_free_device(instance_id)
             try:
-                fs_info = efs.describe_file_systems(FileSystemId=file_system_id)
+                self.ec2.attach_volume(VolumeId=volume_id, InstanceId=instance_id, Device=device)
+            except Exception:
+                self._liberar_device(instance_id, device)
+                raise
+            asignado = True
+            self._esperar_asignacion(volume_id)
+            print(f"Volumen {volume_id} asignado a la instancia {instance_id} en {device}.")
+
+            mount_point = f"/mnt/ebs_{device.rsplit('/', 1)[-1]}"
+            ssh = self._conectar_ssh(instancia["ip"], username)
+            try:
+                host_device = self.resolver_device_en_host(ssh, volume_id, device)
+                self._formatear_y_montar(ssh, host_device, mount_point)
+                print(f"Volumen {volume_id} montado en {mount_point} en la instancia {instance_id}.")
+                rendimiento = None
+                if benchmark:
+                    rendimiento = self._ejecutar_benchmark(ssh, mount_point, volume_id, parametros)
+            except Exception:
+                # Desmontar (si llegó a montarse) para poder desasignar el volumen
+                try:
+                    self._ejecutar_ssh(ssh, f"sudo umount {mount_point}")
+                except Exception:
+                    pass
+                raise
+            finally:
+                ssh.close()
+        except Exception as e:
+            self._descartar_volumen(volume_id, instance_id if asignado else None, device if asignado else None)
+            raise ValueError(f"Volumen {volume_id} en {instance_id}: {e}") from e
+
+        return {
+            "instance_id": instance_id,
+            "volume_id": volume_id,
+            "device": device,
+            "host_device": host_device,
+            "mount_point": mount_point,
+            "rendimiento": rendimiento,
+        }
+
+    def provisionar_volumenes_ebs(
+        self, instance_ids, volumenes_por_instancia=1, size_gb=1, username="ec2-user",
+        max_workers=8, perfil="gp3", iops=None, throughput=None, benchmark=False,
+    ):
+        """Provisionar en paralelo varios volúmenes EBS en varias instancias"""
+        if not instance_ids:
+            raise ValueError("Debes proporcionar al menos un ID de instancia.")
+        parametros = self._parametros_volumen(size_gb, perfil, iops, throughput)
+
+        # Una sola llamada describe para obtener zona e IP de todas las instancias
+        description = self.ec2.describe_instances(InstanceIds=list(instance_ids))
+        instancias = []
+        for reservation in description["Reservations"]:
+            for instance_data in reservation["Instances"]:
+                instancias.append({
+                    "instance_id": instance_data["InstanceId"],
+                    "zona": instance_data["Placement"]["AvailabilityZone"],
+                    "ip": instance_data.get("PublicIpAddress") or os.getenv("INSTANCE_IP"),
+                })
+
+        resultados = []
+        errores = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = [
+                executor.submit(
+                    self._provisionar_volumen, instancia, parametros, username, benchmark
+                )
+                for instancia in instancias
+                for _ in range(volumenes_por_instancia)
+            ]
+            for futuro in as_completed(futuros):
+                try:
+                    resultados.append(futuro.result())
+                except Exception as e:
+                    errores.append(e)
+                    print(f"Error provisionando volumen EBS: {e}")
+
+        print(f"\nVolúmenes EBS provisionados: {len(resultados)}, con error: {len(errores)}")
+        if errores:
+            # Los volúmenes que fallaron ya se han eliminado; los correctos siguen montados
+            raise ValueError(
+                f"Fallaron {len(errores)} de {len(futuros)} volúmenes EBS: "
+                + "; ".join(str(e) for e in errores)
+            )
+        return resultados
+
+    def _tamano_archivo_fio(self, ssh, mount_point, maximo_mb=MAX_ARCHIVO_FIO_MB):
+        """Tamaño del archivo de prueba de fio según el espacio libre del volumen, como mucho maximo_mb"""
+        exit_status, output = self._ejecutar_ssh(
+            ssh, f"df --output=avail -B1M {mount_point} | tail -n 1"
+        )
+        if exit_status != 0 or not output.strip().isdigit():
+            raise ValueError(f"No se pudo obtener el espacio libre de {mount_point}.")
+        return f"{max(1, min(maximo_mb, int(int(output.strip()) * FRACCION_ARCHIVO_FIO)))}M"
+
+    def _ejecutar_benchmark(self, ssh, mount_point, clave, parametros=None, tamano=None, duracion=30):
+        """Ejecutar las pruebas de fio sobre una conexión SSH abierta"""
+        exit_status, _ = self._ejecutar_ssh(ssh, "command -v fio || sudo yum install -y fio")
+        if exit_status != 0:
+            raise ValueError("No se pudo instalar fio en la instancia.")
+        # Sin tamaño explícito, el archivo se ajusta al volumen para no agotar el espacio
+        tamano = tamano or self._tamano_archivo_fio(ssh, mount_point)
+
+        resultados = {}
+        for nombre, modo, bloque, profundidad in PRUEBAS_FIO:
+            command = (
+                f"sudo fio --name={nombre} --filename={mount_point}/fio_prueba "
+                f"--rw={modo} --bs={bloque} --iodepth={profundidad} --size={tamano} "
+                f"--runtime={duracion} --time_based --ioengine=libaio --direct=1 "
+                f"--group_reporting --output-format=json"
+            )
+            exit_status, output = self._ejecutar_ssh(ssh, command)
+            if exit_status != 0:
+                raise ValueError(f"Falló la prueba fio '{nombre}' en {mount_point}.")
+            job = json.loads(output)["jobs"][0]
+            datos = job["write" if "write" in modo else "read"]
+            percentiles = datos.get("clat_ns", {}).get("percentile", {})
+            resultados[nombre] = {
+                "mb_s": round(datos["bw_bytes"] / (1024 * 1024), 2),
+                "iops": round(datos["iops"], 1),
+                "latencia_ms": {
+                    p: round(percentiles.get(f"{float(p):.6f}", 0) / 1e6, 3)
+                    for p in ("50", "95", "99", "99.9")
+                },
+            }
+            print(
+                f"{nombre}: {resultados[nombre]['mb_s']} MiB/s, "
+                f"{resultados[nombre]['iops']} IOPS, p99 {resultados[nombre]['latencia_ms']['99']} ms"
+            )
+        self._ejecutar_ssh(ssh, f"sudo rm -f {mount_point}/fio_prueba")
+
+        if parametros:
+            self._comprobar_rendimiento(clave, parametros, resultados)
+
+        self.resultados_rendimiento[clave] = resultados
+        # Varios hilos pueden terminar su benchmark a la vez
+        os.makedirs(resultados_folder, exist_ok=True)
+        with open(os.path.join(resultados_folder, f"{clave}.json"), "w", encoding="utf-8") as file:
+            json.dump({"parametros": parametros, "resultados": resultados}, file, indent=2)
+        print(f"Resultados de rendimiento guardados en {resultados_folder}/{clave}.json")
+        return resultados
+
+    def _comprobar_rendimiento(self, clave, parametros, resultados, tolerancia=0.9):
+        """Avisar si el volumen no alcanza las IOPS o el throughput provisionados"""
+        iops_medidas = max(
+            resultados["lectura_aleatoria"]["iops"], resultados["escritura_aleatoria"]["iops"]
+        )
+        mb_s_medidos = max(
+            resultados["lectura_secuencial"]["mb_s"], resultados["escritura_secuencial"]["mb_s"]
+        )
+        if parametros.get("Iops") and iops_medidas < parametros["Iops"] * tolerancia:
+            print(
+                f"AVISO: {clave} da {iops_medidas} IOPS de {parametros['Iops']} provisionadas."
+            )
+        if parametros.get("Throughput") and mb_s_medidos < parametros["Throughput"] * tolerancia:
+            print(
+                f"AVISO: {clave} da {mb_s_medidos} MiB/s de {parametros['Throughput']} provisionados."
+            )
+
+    def medir_rendimiento_ebs(
+        self, instance_ip, mount_point="/mnt/ebs_volume", volume_id=None,
+        username="ec2-user", tamano=None, duracion=30,
+    ):
+        """Medir throughput, IOPS y latencia del volumen montado con fio (requiere acceso SSH)"""
+        parametros = None
+        if volume_id:
+            volume = self.ec2.describe_volumes(VolumeIds=[volume_id])["Volumes"][0]
+            parametros = {
+                k: volume[k] for k in ("VolumeType", "Iops", "Throughput", "Size") if k in volume
+            }
+        ssh = self._conectar_ssh(instance_ip, username)
+        try:
+            return self._ejecutar_benchmark(
+                ssh, mount_point, volume_id or mount_point.strip("/").replace("/", "_"),
+                parametros, tamano, duracion,
+            )
+        finally:
+            ssh.close()
+
+    def _esperar_con_backoff(
+        self, comprobar, descripcion, max_espera=600, inicial=1, maximo=20, metrica="efs.espera"
+    ):
+        """Repetir comprobar() con espera exponencial y jitter hasta que devuelva True"""
+        inicio = time.monotonic()
+        espera = inicial
+        with medir_espera(metrica):
+            while not comprobar():
+                if time.monotonic() - inicio > max_espera:
+                    raise TimeoutError(f"Tiempo agotado esperando {descripcion}.")
+                print(f"Esperando {descripcion}... ({espera:.1f}s)")
+                time.sleep(espera * random.uniform(0.5, 1.0))
+                espera = min(espera * 2, maximo)
+        print(f"{descripcion.capitalize()}: listo.")
+
+    def _leer_cache_efs(self):
+        """Leer la caché local de sistemas EFS"""
+        if not os.path.exists(efs_cache_file):
+            return {}
+        with open(efs_cache_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _actualizar_cache_efs(self, creation_token, **datos):
+        """Actualizar la entrada de un token en la caché local de EFS"""
+        with EC2Manager._lock_cache_efs:
+            cache = self._leer_cache_efs()
+            cache.setdefault(creation_token, {}).update(datos)
+            with open(efs_cache_file, "w", encoding="utf-8") as file:
+                json.dump(cache, file, indent=2)
+
+    def _esperar_efs_disponible(self, efs, file_system_id):
+        """Esperar a que el EFS esté disponible (EFS no tiene waiter nativo, usamos polling con backoff)"""
+        def disponible():
+            fs_info = efs.describe_file_systems(FileSystemId=file_system_id)
+            return fs_info["FileSystems"][0]["LifeCycleState"] == "available"
+
+        self._esperar_con_backoff(
+            disponible, f"EFS {file_system_id} disponible", metrica="efs.file_system_available"
+        )
+
+    def _ajustar_modos_efs(self, efs, file_system, performance_mode, throughput_mode, provisioned_throughput):
+        """Aplicar a un EFS reutilizado el modo de throughput pedido y avisar si el de rendimiento difiere"""
+        file_system_id = file_system["FileSystemId"]
+        if file_system["PerformanceMode"] != performance_mode:
+            print(
+                f"AVISO: el EFS {file_system_id} usa el modo de rendimiento "
+                f"'{file_system['PerformanceMode']}' y no '{performance_mode}'; solo se fija al crearlo."
+            )
+        actual = file_system.get("ProvisionedThroughputInMibps")
+        if file_system["ThroughputMode"] == throughput_mode and (
+            throughput_mode != "provisioned" or actual == provisioned_throughput
+        ):
+            return
+        parametros = {"FileSystemId": file_system_id, "ThroughputMode": throughput_mode}
+        if throughput_mode == "provisioned":
+            parametros["ProvisionedThroughputInMibps"] = provisioned_throughput
+        try:
+            efs.update_file_system(**parametros)
+            print(f"EFS {file_system_id}: modo de throughput cambiado a '{throughput_mode}'.")
+        except Exception as e:
+            # AWS limita los cambios de modo de throughput a uno cada 24 horas
+            print(
+                f"AVISO: no se pudo cambiar el modo de throughput del EFS {file_system_id} "
+                f"de '{file_system['ThroughputMode']}' a '{throughput_mode}': {e}"
+            )
+
+    def crear_efs(
+        self, performance_mode="generalPurpose", throughput_mode="elastic",
+        provisioned_throughput=None, creation_token=EFS_CREATION_TOKEN,
+    ):
+        """Obtener el EFS asociado al token o crearlo si no existe"""
+        if performance_mode == "maxIO" and throughput_mode == "elastic":
+            raise ValueError("El modo de throughput 'elastic' no admite el modo de rendimiento 'maxIO'.")
+        if throughput_mode == "provisioned" and not provisioned_throughput:
+            raise ValueError("El modo 'provisioned' requiere provisioned_throughput (MiB/s).")
+        efs = self.efs
+        modos = (performance_mode, throughput_mode, provisioned_throughput)
+
+        # 1. Caché local: comprobar que el EFS sigue existiendo
+        entrada = self._leer_cache_efs().get(creation_token)
+        if entrada and entrada.get("LifeCycleState") == "available":
+            try:
+                fs_info = efs.describe_file_systems(FileSystemId=entrada["FileSystemId"])
                 if fs_info["FileSystems"][0]["LifeCycleState"] == "available":
-                    print(f"EFS {file_system_id} está disponible.")
-                    break
-            except Exception as e:
-                print(f"Esperando EFS... ({attempt + 1}/{max_attempts})")
-            time.sleep(2)
-        
-        # Obtener la zona de disponibilidad de la instancia
-        self.obtener_region(instance_id=instance_id)
-        
-        # Obtener SubnetId y SecurityGroupId de la instancia
-        self._get_instance_id(instance_id)
-        instance_id = self.instance_id or instance_id
-        description = ec2.describe_instances(InstanceIds=[instance_id])
-        instance_data = description["Reservations"][0]["Instances"][0]
-        subnet_id = instance_data["SubnetId"]
-        security_group_id = instance_data["SecurityGroups"][0]["GroupId"]
-        print(f"SubnetId: {subnet_id}, SecurityGroupId: {security_group_id}")
+                    print(f"\nEFS {entrada['FileSystemId']} reutilizado (caché local).")
+                    self._ajustar_modos_efs(efs, fs_info["FileSystems"][0], *modos)
+                    return entrada["FileSystemId"]
+            except efs.exceptions.FileSystemNotFound:
+                print(f"EFS {entrada['FileSystemId']} de la caché ya no existe.")
+
+        # 2. Buscar en AWS por token de creación
+        file_systems = efs.describe_file_systems(CreationToken=creation_token)["FileSystems"]
+        file_systems = [fs for fs in file_systems if fs["LifeCycleState"] in ("creating", "available")]
+        if file_systems:
+            file_system_id = file_systems[0]["FileSystemId"]
+            print(f"\nEFS {file_system_id} reutilizado (token {creation_token}).")
+            if file_systems[0]["LifeCycleState"] == "available":
+                self._ajustar_modos_efs(efs, file_systems[0], *modos)
+            else:
+                self._esperar_efs_disponible(efs, file_system_id)
+                fs_info = efs.describe_file_systems(FileSystemId=file_system_id)
+                self._ajustar_modos_efs(efs, fs_info["FileSystems"][0], *modos)
+        else:
+            # 3. Crear un EFS nuevo con el token
+            parametros = {
+                "CreationToken": creation_token,
+                "PerformanceMode": performance_mode,
+                "ThroughputMode": throughput_mode,
+                "Tags": [{"Key": "Name", "Value": creation_token}],
+            }
+            if throughput_mode == "provisioned":
+                parametros["ProvisionedThroughputInMibps"] = provisioned_throughput
+            response = efs.create_file_system(**parametros)
+            file_system_id = response["FileSystemId"]
+            print(f"\nEFS creado con ID: {file_system_id} ({performance_mode}, {throughput_mode})")
 
-        # Crear punto de montaje
-        mount_target = efs.create_mount_target(
-            FileSystemId=file_system_id,
-            SubnetId=subnet_id,
-            SecurityGroups=[security_group_id],
+        self._esperar_efs_disponible(efs, file_system_id)
+        self._actualizar_cache_efs(
+            creation_token, FileSystemId=file_system_id, LifeCycleState="available"
         )
-        print(f"Punto de montaje creado: {mount_target}")
+        return file_system_id
 
-        # Configurar la conexión SSH
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    def crear_puntos_montaje_efs(self, file_system_id, subnet_ids, security_group_ids):
+        """Crear en paralelo los puntos de montaje EFS que falten y esperar a que estén disponibles"""
+        # Sin subredes, describe_subnets no filtra y devolvería todas las de la cuenta
+        if not subnet_ids:
+            raise ValueError("Debes proporcionar al menos una subred para los puntos de montaje EFS.")
+        efs = self.efs
 
-        # Cargar clave privada
-        key = paramiko.RSAKey.from_private_key_file(os.getenv("PEM_FILE"))
+        # EFS admite un punto de montaje por zona: reutilizar los existentes
+        existentes = {
+            mt["AvailabilityZoneName"]: mt
+            for mt in efs.describe_mount_targets(FileSystemId=file_system_id)["MountTargets"]
+            if mt["LifeCycleState"] in ("creating", "available")
+        }
+        subnets = self.ec2.describe_subnets(SubnetIds=list(subnet_ids))["Subnets"]
+        mount_targets = {}
+        pendientes = {}
+        for subnet in subnets:
+            zona = subnet["AvailabilityZone"]
+            if zona in existentes:
+                mount_targets[subnet["SubnetId"]] = existentes[zona]["MountTargetId"]
+                print(f"Punto de montaje {existentes[zona]['MountTargetId']} reutilizado en {zona}")
+            elif zona not in pendientes.values():
+                pendientes[subnet["SubnetId"]] = zona
 
-        ssh.connect(
-            hostname=instance_ip, username=username, pkey=key, port=22, timeout=10
+        def crear(subnet_id):
+            mount_target = efs.create_mount_target(
+                FileSystemId=file_system_id,
+                SubnetId=subnet_id,
+                SecurityGroups=list(security_group_ids),
+            )
+            print(f"Punto de montaje {mount_target['MountTargetId']} creado en {subnet_id}")
+            return mount_target["MountTargetId"]
+
+        errores = {}
+        if pendientes:
+            with ThreadPoolExecutor(max_workers=len(pendientes)) as executor:
+                futuros = {executor.submit(crear, subnet_id): subnet_id for subnet_id in pendientes}
+                for futuro in as_completed(futuros):
+                    try:
+                        mount_targets[futuros[futuro]] = futuro.result()
+                    except Exception as e:
+                        errores[pendientes[futuros[futuro]]] = e
+                        print(f"Error creando punto de montaje en {futuros[futuro]}: {e}")
+
+        # Cada zona pedida necesita su punto de montaje: si falta alguno no se espera ni se monta
+        if errores:
+            raise ValueError(
+                f"No se pudo crear el punto de montaje de {file_system_id} en "
+                + ", ".join(f"{zona} ({error})" for zona, error in sorted(errores.items()))
+            )
+
+        mount_target_ids = set(mount_targets.values())
+
+        def disponibles():
+            estados = [
+                mt["LifeCycleState"]
+                for mt in efs.describe_mount_targets(FileSystemId=file_system_id)["MountTargets"]
+                if mt["MountTargetId"] in mount_target_ids
+            ]
+            return len(estados) == len(mount_target_ids) and all(estado == "available" for estado in estados)
+
+        self._esperar_con_backoff(
+            disponibles, f"puntos de montaje de {file_system_id}", metrica="efs.mount_target_available"
         )
+        return list(mount_target_ids)
 
-        # Comandos para montar EFS
+    def montar_efs_en_instancia(
+        self, instance_ip, file_system_id, mount_point="/mnt/efs", username="ec2-user",
+        opciones=OPCIONES_MONTAJE_EFS,
+    ):
+        """Montar un EFS en la instancia por NFS con opciones de throughput (requiere acceso SSH)"""
+        dns_name = f"{file_system_id}.efs.{obtener_sesion().region_name}.amazonaws.com"
         commands = [
-            "sudo yum install -y amazon-efs-utils",
-            f"sudo mkdir -p /mnt/efs",
-            f"sudo mount -t efs {file_system_id}:/ /mnt/efs",
-            "sudo chmod 777 /mnt/efs",
+            "sudo yum install -y nfs-utils",
+            f"sudo mkdir -p {mount_point}",
+            f"sudo mount -t nfs4 -o {opciones} {dns_name}:/ {mount_point}",
+            f"sudo chmod 777 {mount_point}",
+            f"echo {READ_AHEAD_EFS_KB} | sudo tee /sys/class/bdi/$(mountpoint -d {mount_point})/read_ahead_kb",
         ]
 
-        for command in commands:
-            stdin, stdout, stderr = ssh.exec_command(command)
-            stdout.channel.recv_exit_status()  # Esperar a que el comando termine
-            print(f"Ejecutado: {command}")
+        ssh = self._conectar_ssh(instance_ip, username)
+        try:
+            for command in commands:
+                exit_status, _ = self._ejecutar_ssh(ssh, command)
+                if exit_status != 0:
+                    raise ValueError(
+                        f"Falló '{command}' en la instancia (código de salida {exit_status})."
+                    )
+                print(f"Ejecutado: {command}")
+        finally:
+            ssh.close()
+        print(f"EFS {file_system_id} montado en {mount_point} en la instancia {instance_ip}.")
+
+    def crear_efs_y_montar_en_instancia(
+        self, instance_ip, instance_id=None, username="ec2-user", subnet_ids=None,
+        performance_mode="generalPurpose", throughput_mode="elastic",
+        provisioned_throughput=None, creation_token=EFS_CREATION_TOKEN,
+    ):
+        """Crear o reutilizar un sistema de archivos EFS, montarlo en la instancia y añadir un archivo de prueba"""
+        # Obtener SubnetId y SecurityGroupId de la instancia
+        self._get_instance_id(instance_id)
+        instance_id = self.instance_id or instance_id
+        description = self.ec2.describe_instances(InstanceIds=[instance_id])
+        instance_data = description["Reservations"][0]["Instances"][0]
+        subnet_id = instance_data["SubnetId"]
+        security_group_id = instance_data["SecurityGroups"][0]["GroupId"]
+        print(f"SubnetId: {subnet_id}, SecurityGroupId: {security_group_id}")
+
+        # Obtener o crear el EFS y un punto de montaje en cada subred solicitada
+        file_system_id = self.crear_efs(
+            performance_mode, throughput_mode, provisioned_throughput, creation_token
+        )
+        subredes = list(dict.fromkeys([subnet_id] + list(subnet_ids or [])))
+        self.crear_puntos_montaje_efs(file_system_id, subredes, [security_group_id])
+
+        self.montar_efs_en_instancia(instance_ip, file_system_id, username=username)
 
         # Agregar un archivo de prueba en el EFS montado
+        ssh = self._conectar_ssh(instance_ip, username)
         test_file_command = f'echo "Prueba de almacenamiento en EFS" | sudo tee /mnt/efs/prueba_efs.txt'
-        stdin, stdout, stderr = ssh.exec_command(test_file_command)
-        stdout.channel.recv_exit_status()
+        self._ejecutar_ssh(ssh, test_file_command)
         print(f"Archivo de prueba creado en /mnt/efs/prueba_efs.txt")
-        
+
         # Leer el archivo de prueba para verificar
         read_file_command = f"sudo cat /mnt/efs/prueba_efs.txt"
-        stdin, stdout, stderr = ssh.exec_command(read_file_command)
-        output = stdout.read().decode()
+        _, output = self._ejecutar_ssh(ssh, read_file_command)
         print(f"Contenido del archivo de prueba: {output}")
-        
+
+        ssh.close()
+        return file_system_id
+
+    # --------------------------------
+    # Carga de datos de S3 en volúmenes montados (EBS o EFS)
+    # --------------------------------
+
+    def _listar_objetos_s3(self, bucket_name, prefix):
+        """Listar (clave, tamaño, ETag) de los objetos bajo un prefijo, sin marcadores de carpeta"""
+        s3_client = ClienteConRitmo(obtener_cliente("s3"), clave_s3(bucket_name, prefix))
+        objetos = []
+        for page in s3_client.get_paginator("list_objects_v2").paginate(
+            Bucket=bucket_name, Prefix=prefix
+        ):
+            for obj in page.get("Contents", []):
+                if not obj["Key"].endswith("/"):
+                    objetos.append((obj["Key"], obj["Size"], obj["ETag"]))
+        return objetos
+
+    def _ruta_manifiesto(self, host, mount_point):
+        nombre = f"{host}_{mount_point.strip('/').replace('/', '_')}.json"
+        return os.path.join(manifiestos_folder, nombre)
+
+    def _leer_manifiesto(self, ruta):
+        """Leer el manifiesto de archivos ya cargados (clave -> ETag)"""
+        if not os.path.exists(ruta):
+            return {}
+        with open(ruta, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _guardar_manifiesto(self, ruta, manifiesto):
+        escribir_json_atomico(ruta, manifiesto, indent=2)
+
+    def _cargar_objeto_remoto(self, ssh, executor, bucket_name, key, size, destino, tamano_rango):
+        """Descargar un objeto en la instancia con GETs por rangos concurrentes (curl + dd)"""
+        s3_client = obtener_cliente("s3")
+        command = f"mkdir -p {shlex.quote(os.path.dirname(destino))} && truncate -s {size} {shlex.quote(destino)}"
+        exit_status, _ = self._ejecutar_ssh(ssh, command)
+        if exit_status != 0:
+            raise ValueError(f"No se pudo preparar {destino} en la instancia.")
+
+        def descargar_rango(inicio):
+            fin = min(inicio + tamano_rango, size) - 1
+            # La firma es local y barata: firmar cada rango evita los 403 de
+            # URLs caducadas cuando la carga dura más que su vigencia
+            url = s3_client.generate_presigned_url(
+                "get_object", Params={"Bucket": bucket_name, "Key": key},
+                ExpiresIn=VIGENCIA_URL_RANGO,
+            )
+            # Los errores de curl se devuelven por la salida estándar para
+            # distinguir el throttling (429/503) del resto de fallos
+            command = (
+                f"set -o pipefail; {{ curl -sfS -r {inicio}-{fin} {shlex.quote(url)} | "
+                f"dd of={shlex.quote(destino)} bs=1M seek={inicio} oflag=seek_bytes conv=notrunc status=none; }} 2>&1"
+            )
+            exit_status, output = self._ejecutar_ssh(ssh, command)
+            if exit_status != 0:
+                if re.search(r"error: (429|503)\b", output):
+                    raise ThrottlingExterno(f"S3 limitó el rango {inicio}-{fin} de {key}: {output.strip()}")
+                raise ValueError(f"Falló la descarga del rango {inicio}-{fin} de {key}: {output.strip()}")
+
+        # Los GETs salen de la instancia, pero comparten el ritmo del prefijo
+        futuros = [
+            executor.submit(ejecutar, clave_s3(bucket_name, key), descargar_rango, inicio)
+            for inicio in range(0, size, tamano_rango)
+        ]
+        for futuro in futuros:
+            futuro.result()
+
+    def _cargar_objeto_sftp(self, ssh, bucket_name, key, destino):
+        """Enviar un objeto desde el controlador a la instancia por SFTP con escrituras en pipeline"""
+        s3_client = obtener_cliente("s3")
+        body = ejecutar(clave_s3(bucket_name, key), s3_client.get_object, Bucket=bucket_name, Key=key)["Body"]
+        sftp = ssh.open_sftp()
+        try:
+            with sftp.open(destino, "wb") as remote_file:
+                remote_file.set_pipelined(True)
+                for chunk in body.iter_chunks(chunk_size=1024 * 1024):
+                    remote_file.write(chunk)
+        finally:
+            sftp.close()
+            body.close()
+
+    def _cargar_en_host(
+        self, host, objetos, bucket_name, prefix, mount_point, modo, username,
+        max_workers, tamano_rango,
+    ):
+        """Cargar en un host los objetos que aún no figuran en su manifiesto"""
+        ruta_manifiesto = self._ruta_manifiesto(host, mount_point)
+        manifiesto = self._leer_manifiesto(ruta_manifiesto)
+        pendientes = [obj for obj in objetos if manifiesto.get(obj[0]) != obj[2]]
+        print(f"{host}: {len(objetos) - len(pendientes)} archivos ya cargados, {len(pendientes)} pendientes.")
+
+        ssh = self._conectar_ssh(host, username)
+        lock_manifiesto = threading.Lock()
+        bytes_cargados = 0
+        inicio = time.monotonic()
+
+        if modo == "sftp":
+            directorios = {
+                os.path.dirname(f"{mount_point}/{key[len(prefix):]}") for key, _, _ in pendientes
+            }
+            if directorios:
+                exit_status, _ = self._ejecutar_ssh(
+                    ssh, "mkdir -p " + " ".join(shlex.quote(d) for d in sorted(directorios))
+                )
+                if exit_status != 0:
+                    ssh.close()
+                    raise ValueError(f"{host}: no se pudieron crear los directorios de destino en {mount_point}.")
+
+        # Los rangos de los objetos se descargan en un pool aparte para no
+        # bloquear el pool de objetos esperando a sus propios rangos. Ambos
+        # pools se reparten un único presupuesto de canales SSH, de modo que
+        # la conexión nunca supera MaxSessions sea cual sea max_workers.
+        canales = max(2, min(max_workers, MAX_CANALES_SSH))
+        if modo == "sftp":
+            workers_objetos, workers_rangos = canales, 1
+        else:
+            workers_objetos = max(1, canales // 4)
+            workers_rangos = canales - workers_objetos
+        with ThreadPoolExecutor(max_workers=workers_rangos) as executor_rangos, \
+                ThreadPoolExecutor(max_workers=workers_objetos) as executor:
+            def cargar(objeto):
+                key, size, etag = objeto
+                destino = f"{mount_point}/{key[len(prefix):]}"
+                if modo == "sftp":
+                    self._cargar_objeto_sftp(ssh, bucket_name, key, destino)
+                else:
+                    self._cargar_objeto_remoto(
+                        ssh, executor_rangos, bucket_name, key, size, destino, tamano_rango
+                    )
+                with lock_manifiesto:
+                    manifiesto[key] = etag
+                    self._guardar_manifiesto(ruta_manifiesto, manifiesto)
+                return size
+
+            futuros = {executor.submit(cargar, objeto): objeto[0] for objeto in pendientes}
+            errores = 0
+            for futuro in as_completed(futuros):
+                try:
+                    bytes_cargados += futuro.result()
+                except Exception as e:
+                    errores += 1
+                    print(f"{host}: error cargando {futuros[futuro]}: {e}")
+
         ssh.close()
+        segundos = time.monotonic() - inicio
+        mb_s = bytes_cargados / (1024 * 1024) / segundos if segundos > 0 else 0.0
+        print(f"{host}: {bytes_cargados / (1024 * 1024):.1f} MiB en {segundos:.1f}s ({mb_s:.1f} MiB/s)")
+        return {
+            "archivos": len(pendientes) - errores,
+            "errores": errores,
+            "bytes": bytes_cargados,
+            "segundos": round(segundos, 2),
+            "mb_s": round(mb_s, 2),
+        }
+
+    def cargar_s3_en_volumen(
+        self, instance_ips, bucket_name, prefix, mount_point, modo="remoto",
+        username="ec2-user", max_workers=8, tamano_rango=TAMANO_RANGO_CARGA,
+    ):
+        """Llenar un volumen montado con los objetos de un prefijo S3 en una o varias instancias"""
+        if modo not in ("remoto", "sftp"):
+            raise ValueError("El modo de carga debe ser 'remoto' o 'sftp'.")
+        if isinstance(instance_ips, str):
+            instance_ips = [instance_ips]
+
+        objetos = self._listar_objetos_s3(bucket_name, prefix)
+        total = sum(size for _, size, _ in objetos)
+        print(f"\nCargando {len(objetos)} objetos ({total / (1024 * 1024):.1f} MiB) de s3://{bucket_name}/{prefix} en {mount_point}")
 
+        resultados = {}
+        with ThreadPoolExecutor(max_workers=len(instance_ips)) as executor:
+            futuros = {
+                executor.submit(
+                    self._cargar_en_host, host, objetos, bucket_name, prefix, mount_point,
+                    modo, username, max_workers, tamano_rango,
+                ): host
+                for host in instance_ips
+            }
+            for futuro in as_completed(futuros):
+                resultados[futuros[futuro]] = futuro.result()
+        return resultados
 
-ec2_manager = EC2Manager(ami_id="ami-07ff62358b87c7116", instance_name="Test")
 
+def main():
+    """Flujo de ejemplo: volúmenes EBS y EFS sobre la instancia configurada"""
+    cargar_entorno()
+    contar_instancias()
 
-# 1. Probar la creación, ejecución, parada y eliminación de la instancia
+    ec2_manager = EC2Manager(ami_id="ami-07ff62358b87c7116", instance_name="Test")
 
-# # Crear y ejecutar instancia
-# ec2_manager.crear_instancia()
+    # 1. Probar la creación, ejecución, parada y eliminación de la instancia
 
-# # Asignar etiqueta
-# ec2_manager.aplicar_etiqueta(tag="EC2-Test")
+    # # Crear y ejecutar instancia
+    # ec2_manager.crear_instancia()
 
-# # Esperar a que esté en ejecución
-# ec2_manager.esperar_estado("running")
+    # # Asignar etiqueta
+    # ec2_manager.aplicar_etiqueta(tag="EC2-Test")
 
-# # Parar ejecución
-# ec2_manager.parar_instancia()
+    # # Esperar a que esté en ejecución
+    # ec2_manager.esperar_estado("running")
 
-# # Esperar a que esté detenida
-# ec2_manager.esperar_estado("stopped")
+    # # Parar ejecución
+    # ec2_manager.parar_instancia()
 
-# # Eliminar instancia
-# ec2_manager.eliminar_instancia()
+    # # Esperar a que esté detenida
+    # ec2_manager.esperar_estado("stopped")
 
+    # # Eliminar instancia
+    # ec2_manager.eliminar_instancia()
 
-# 2. Crear un volumen EBS y asignarlo a la instancia creada
+    # 2. Crear un volumen EBS y asignarlo a la instancia creada
 
-# Crear una nueva instancia para pruebas
-# ec2_manager.crear_instancia()
-# ec2_manager.esperar_estado("running")
+    # Crear una nueva instancia para pruebas
+    # ec2_manager.crear_instancia()
+    # ec2_manager.esperar_estado("running")
 
-instance_id = ec2_manager.instance_id or os.getenv("INSTANCE_ID")
-if instance_id:
-    # Obtener la zona de disponibilidad de la instancia
-    ec2_manager.obtener_region(instance_id=instance_id)
-    
-    # Crear volumen en la misma zona
-    volumen_id = ec2_manager.crear_volumen_ebs(size_gb=1)
-    
-    # Esperar a que el volumen esté disponible
-    waiter = ec2.get_waiter("volume_available")
-    waiter.wait(VolumeIds=[volumen_id])
-    print(f"Volumen {volumen_id} está disponible.")
-    
-    # Asignar volumen EBS a la instancia
-    device_name = ec2_manager.asignar_volumen_ebs(
-        volume_id=volumen_id, instance_id=instance_id
+    instance_id = ec2_manager.instance_id or os.getenv("INSTANCE_ID")
+    if not instance_id:
+        print("INSTANCE_ID no configurado en variables de entorno")
+        return
+
+    # Crear, asignar, formatear y montar los volúmenes EBS en la instancia
+    ec2_manager.provisionar_volumenes_ebs(
+        instance_ids=[instance_id], volumenes_por_instancia=1, size_gb=1
     )
-else:
-    print("INSTANCE_ID no configurado en variables de entorno")
 
-# Montar el volumen EBS en la instancia (requiere acceso SSH)
+    instance_ip = ec2_manager.obtener_ip_publica(instance_id=instance_id)
 
-instance_ip = ec2_manager.obtener_ip_publica(instance_id=instance_id)
+    # Crear EFS, montar en la instancia y añadir un archivo de prueba
+    ec2_manager.crear_efs_y_montar_en_instancia(
+        instance_ip=instance_ip,
+        instance_id=instance_id
+    )
 
-mount_device = device_name.replace("/dev/sd", "/dev/xvd")
-ec2_manager.montar_volumen_ebs_en_instancia(
-    instance_ip=instance_ip,
-    device=mount_device,
-)
+    # Cargar en el EFS montado los datos del bucket (reanudable mediante manifiesto)
+    # ec2_manager.cargar_s3_en_volumen(
+    #     instance_ips=[instance_ip],
+    #     bucket_name="gestion-practicas-bucket",
+    #     prefix="gestion/",
+    #     mount_point="/mnt/efs",
+    # )
 
-# Crear EFS, montar en la instancia y añadir un archivo de prueba
-ec2_manager.crear_efs_y_montar_en_instancia(
-    instance_ip=instance_ip,
-    instance_id=instance_id
-)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import hashlib
+import json
+import os
+
+# --------------------------------
+# Utilidades de archivos locales compartidas: escritura atómica de JSON
+# (archivo temporal + os.replace, sin estados a medio escribir si el
+# proceso se interrumpe) y huella SHA-256 por bloques.
+# --------------------------------
+
+
+def escribir_json_atomico(ruta, datos, sincronizar=False, **opciones_json):
+    """Escribir datos como JSON en ruta de forma atómica, creando su carpeta si falta
+
+    Con sincronizar=True se hace fsync antes del reemplazo para que el
+    contenido sobreviva también a una caída del sistema.
+    """
+    carpeta = os.path.dirname(ruta)
+    if carpeta and not os.path.exists(carpeta):
+        os.makedirs(carpeta, exist_ok=True)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as file:
+        json.dump(datos, file, **opciones_json)
+        if sincronizar:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(temporal, ruta)
+
+
+def sha256_archivo(ruta):
+    """SHA-256 del contenido de un archivo, leído en bloques de 1 MiB"""
+    sha256 = hashlib.sha256()
+    with open(ruta, 'rb') as file:
+        for bloque in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(bloque)
+    return sha256.hexdigest()
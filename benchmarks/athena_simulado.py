@@ -0,0 +1,54 @@
+import itertools
+import threading
+import time
+
+# --------------------------------
+# Sustituto local de Athena: cada consulta pasa por QUEUED -> RUNNING ->
+# SUCCEEDED según el tiempo transcurrido y devuelve un bloque Statistics.
+# Implementa solo las operaciones que usa ejecutar_consulta_athena.
+# --------------------------------
+
+
+class AthenaSimulado:
+    def __init__(self, cola_ms=200, ejecucion_ms=300, bytes_escaneados=1024 * 1024):
+        self.cola_ms = cola_ms
+        self.ejecucion_ms = ejecucion_ms
+        self.bytes_escaneados = bytes_escaneados
+        self.llamadas = {"StartQueryExecution": 0, "GetQueryExecution": 0}
+        self._consultas = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_query_execution(self, QueryString, ResultConfiguration=None, **kwargs):
+        with self._lock:
+            self.llamadas["StartQueryExecution"] += 1
+            query_id = f"consulta-{next(self._ids)}"
+            self._consultas[query_id] = (QueryString, time.monotonic())
+        return {"QueryExecutionId": query_id}
+
+    def get_query_execution(self, QueryExecutionId):
+        with self._lock:
+            self.llamadas["GetQueryExecution"] += 1
+            query, inicio = self._consultas[QueryExecutionId]
+        transcurrido_ms = (time.monotonic() - inicio) * 1000
+        if transcurrido_ms < self.cola_ms:
+            estado = "QUEUED"
+        elif transcurrido_ms < self.cola_ms + self.ejecucion_ms:
+            estado = "RUNNING"
+        else:
+            estado = "SUCCEEDED"
+        execution = {
+            "QueryExecutionId": QueryExecutionId,
+            "Query": query,
+            "Status": {"State": estado},
+        }
+        if estado == "SUCCEEDED":
+            execution["Statistics"] = {
+                "EngineExecutionTimeInMillis": self.ejecucion_ms,
+                "DataScannedInBytes": self.bytes_escaneados,
+                "TotalExecutionTimeInMillis": self.cola_ms + self.ejecucion_ms,
+                "QueryQueueTimeInMillis": self.cola_ms,
+                "ServicePreProcessingTimeInMillis": 0,
+                "ServiceProcessingTimeInMillis": 0,
+            }
+        return {"QueryExecution": execution}
@@ -0,0 +1,285 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# --------------------------------
+# Benchmarks sin conexión: S3 y EC2 contra moto en modo servidor, Athena
+# contra AthenaSimulado y el motor de consultas local. Uso:
+#   pip install -r requirements.txt -r requirements-bench.txt
+#   python benchmarks/ejecutar_benchmarks.py --referencia benchmarks/resultados_previos.json
+# Devuelve código 1 si alguna métrica incumple umbrales.json o empeora
+# respecto a la referencia más de la tolerancia indicada.
+# --------------------------------
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+BUCKET_BENCH = 'bench-almacenamiento'
+
+
+def puerto_libre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_entorno_local():
+    """Arrancar moto en modo servidor y apuntar los clientes compartidos a él"""
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = puerto_libre()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    os.environ.update({
+        'AWS_ENDPOINT_URL': f'http://127.0.0.1:{port}',
+        'ACCESS_KEY': 'testing',
+        'SECRET_KEY': 'testing',
+        'SESSION_TOKEN': 'testing',
+        'REGION': 'us-east-1',
+    })
+    # Las consultas simuladas no deben mezclarse con el historial real de Athena
+    import perfil_athena
+
+    perfil_athena.historial_file = os.path.join(tempfile.mkdtemp(), 'historial_athena.jsonl')
+    return server
+
+
+def medir(funcion, *args, **kwargs):
+    """Devolver (segundos, resultado) de una llamada, sin mostrar su salida"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+    return segundos, resultado
+
+
+def leer_por_vistas(lector):
+    """Recorrer un LectorS3 entero sin copiar los bloques"""
+    total = 0
+    while True:
+        datos = lector.vista()
+        if not datos:
+            return total
+        total += len(datos)
+
+
+def bench_generacion(registros):
+    from almacenamiento_s3 import generar_csv_estudiantes, generar_jsonl_estudiantes, serializar_lote
+    from lotes import LoteEstudiantes
+
+    segundos_csv, _ = medir(generar_csv_estudiantes, registros)
+    segundos_jsonl, _ = medir(generar_jsonl_estudiantes, registros)
+    # Ambos formatos desde un único lote generado
+    segundos_multiformato, _ = medir(lambda: serializar_lote(LoteEstudiantes.generar(registros)))
+    return {
+        'generacion.csv_filas_por_s': registros / segundos_csv,
+        'generacion.jsonl_filas_por_s': registros / segundos_jsonl,
+        'generacion.multiformato_filas_por_s': registros / segundos_multiformato,
+    }
+
+
+def bench_s3(tamano_mb, objetos_sync):
+    from boto3.s3.transfer import TransferConfig
+
+    from almacenamiento_s3 import descargar_prefijo
+    from clientes import obtener_cliente
+    from lector_s3 import LectorS3
+
+    s3_client = obtener_cliente('s3')
+    s3_client.create_bucket(Bucket=BUCKET_BENCH)
+    datos = os.urandom(tamano_mb * 1024 * 1024)
+    multipart = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024, max_concurrency=10
+    )
+
+    segundos_simple, _ = medir(
+        s3_client.put_object, Bucket=BUCKET_BENCH, Key='bench/simple.bin', Body=datos
+    )
+    segundos_multipart, _ = medir(
+        s3_client.upload_fileobj, io.BytesIO(datos), BUCKET_BENCH, 'bench/multipart.bin', Config=multipart
+    )
+    segundos_descarga, _ = medir(
+        s3_client.download_fileobj, BUCKET_BENCH, 'bench/multipart.bin', io.BytesIO(), Config=multipart
+    )
+
+    with LectorS3(BUCKET_BENCH, 'bench/multipart.bin', tamano_bloque=4 * 1024 * 1024) as lector:
+        segundos_lector, _ = medir(leer_por_vistas, lector)
+
+    pequeno = os.urandom(16 * 1024)
+    for i in range(objetos_sync):
+        s3_client.put_object(Bucket=BUCKET_BENCH, Key=f'bench/sync/objeto_{i:05d}.bin', Body=pequeno)
+    with tempfile.TemporaryDirectory() as carpeta:
+        segundos_sync, _ = medir(descargar_prefijo, 'bench/sync/', BUCKET_BENCH, carpeta)
+
+    return {
+        's3.subida_simple_mb_s': tamano_mb / segundos_simple,
+        's3.subida_multipart_mb_s': tamano_mb / segundos_multipart,
+        's3.descarga_multipart_mb_s': tamano_mb / segundos_descarga,
+        's3.lector_rangos_mb_s': tamano_mb / segundos_lector,
+        's3.sincronizacion_objetos_por_s': objetos_sync / segundos_sync,
+    }
+
+
+def bench_athena(consultas):
+    import clientes
+    from almacenamiento_s3 import ejecutar_consulta_athena
+    from athena_simulado import AthenaSimulado
+
+    athena = AthenaSimulado(cola_ms=200, ejecucion_ms=300)
+    clientes._clientes['athena'] = athena
+    try:
+        segundos, _ = medir(
+            lambda: [ejecutar_consulta_athena(f'SELECT {i}') for i in range(consultas)]
+        )
+    finally:
+        del clientes._clientes['athena']
+
+    motor_s = (athena.cola_ms + athena.ejecucion_ms) / 1000
+    return {
+        'athena.sobrecoste_s_por_consulta': segundos / consultas - motor_s,
+        'athena.llamadas_por_consulta': sum(athena.llamadas.values()) / consultas,
+    }
+
+
+def bench_consultas_locales(registros):
+    import almacenamiento_s3
+    from clientes import obtener_cliente
+    from consultas_locales import EnrutadorConsultas
+
+    s3_client = obtener_cliente('s3')
+    s3_client.create_bucket(Bucket=almacenamiento_s3.bucket_name)
+    s3_client.put_object(
+        Bucket=almacenamiento_s3.bucket_name, Key=f'{almacenamiento_s3.folder_name}csv/datos_practicas.csv',
+        Body=almacenamiento_s3.generar_csv_estudiantes(registros, 1),
+    )
+
+    enrutador = EnrutadorConsultas()
+    with tempfile.TemporaryDirectory() as carpeta:
+        consultas = list(almacenamiento_s3.CONSULTAS_CSV.items())
+        # La primera consulta incluye la carga de la tabla; las siguientes la reutilizan
+        segundos_carga, _ = medir(enrutador.ejecutar, consultas[0][1], consultas[0][0], 'local', carpeta)
+        segundos, _ = medir(
+            lambda: [enrutador.ejecutar(sql, descripcion, 'auto', carpeta) for descripcion, sql in consultas]
+        )
+    return {
+        'local.primera_consulta_s': segundos_carga,
+        'local.s_por_consulta': segundos / len(consultas),
+    }
+
+
+def bench_ec2():
+    from almacenamiento_ec2 import EC2Manager
+
+    ec2_client = EC2Manager(ami_id=None).ec2
+    ami_id = ec2_client.describe_images(Owners=['amazon'])['Images'][0]['ImageId']
+    ec2_client.create_key_pair(KeyName='bench')
+
+    llamadas = []
+
+    def contar(model, **kwargs):
+        llamadas.append(model.name)
+
+    ec2_client.meta.events.register('before-call.ec2.*', contar)
+    try:
+        ec2_manager = EC2Manager(ami_id=ami_id, key_name='bench', instance_name='bench')
+
+        # Flujo de instancia: crear, etiquetar, esperar, zona e IP
+        medir(ec2_manager.crear_instancia)
+        medir(ec2_manager.aplicar_etiqueta)
+        medir(ec2_manager.esperar_estado, 'running')
+        medir(ec2_manager.obtener_region)
+        medir(ec2_manager.obtener_ip_publica)
+        llamadas_instancia = len(llamadas)
+
+        # Flujo de volumen: crear, esperar y asignar
+        del llamadas[:]
+        _, volume_id = medir(ec2_manager.crear_volumen_ebs, size_gb=1)
+        medir(ec2_client.get_waiter('volume_available').wait, VolumeIds=[volume_id])
+        medir(ec2_manager.asignar_volumen_ebs, volume_id)
+        llamadas_volumen = len(llamadas)
+    finally:
+        ec2_client.meta.events.unregister('before-call.ec2.*', contar)
+
+    return {
+        'ec2.llamadas_flujo_instancia': llamadas_instancia,
+        'ec2.llamadas_flujo_volumen': llamadas_volumen,
+    }
+
+
+def comprobar_regresiones(metricas, umbrales, referencia=None, tolerancia=0.2):
+    """Listar las métricas fuera de umbral o peores que la referencia"""
+    regresiones = []
+    for nombre, limite in umbrales.items():
+        valor = metricas.get(nombre)
+        if valor is None:
+            continue
+        if 'min' in limite and valor < limite['min']:
+            regresiones.append(f'{nombre}: {valor:.3f} < mínimo {limite["min"]}')
+        if 'max' in limite and valor > limite['max']:
+            regresiones.append(f'{nombre}: {valor:.3f} > máximo {limite["max"]}')
+        if referencia and nombre in referencia:
+            previo = referencia[nombre]
+            if 'min' in limite and valor < previo * (1 - tolerancia):
+                regresiones.append(f'{nombre}: {valor:.3f} empeora respecto a {previo:.3f}')
+            if 'max' in limite and valor > previo * (1 + tolerancia):
+                regresiones.append(f'{nombre}: {valor:.3f} empeora respecto a {previo:.3f}')
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks sin conexión del proyecto')
+    parser.add_argument('--salida', default=os.path.join(BENCH_DIR, 'resultados.json'))
+    parser.add_argument('--umbrales', default=os.path.join(BENCH_DIR, 'umbrales.json'))
+    parser.add_argument('--referencia', help='Resultados previos con los que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    parser.add_argument('--registros', type=int, default=2000)
+    parser.add_argument('--tamano-mb', type=int, default=32)
+    parser.add_argument('--objetos-sync', type=int, default=200)
+    parser.add_argument('--consultas', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    server = iniciar_entorno_local()
+    try:
+        metricas = {}
+        metricas.update(bench_generacion(args.registros))
+        metricas.update(bench_s3(args.tamano_mb, args.objetos_sync))
+        metricas.update(bench_athena(args.consultas))
+        metricas.update(bench_consultas_locales(args.registros))
+        metricas.update(bench_ec2())
+    finally:
+        server.stop()
+
+    with open(args.umbrales, 'r', encoding='utf-8') as file:
+        umbrales = json.load(file)
+    referencia = None
+    if args.referencia and os.path.exists(args.referencia):
+        with open(args.referencia, 'r', encoding='utf-8') as file:
+            referencia = json.load(file)['metricas']
+    regresiones = comprobar_regresiones(metricas, umbrales, referencia, args.tolerancia)
+
+    for nombre, valor in sorted(metricas.items()):
+        print(f'{nombre}: {valor:.3f}')
+    with open(args.salida, 'w', encoding='utf-8') as file:
+        json.dump({
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'metricas': metricas,
+            'regresiones': regresiones,
+        }, file, indent=2)
+    print(f'\nResultados guardados en {args.salida}')
+
+    for regresion in regresiones:
+        print(f'REGRESIÓN: {regresion}')
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
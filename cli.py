@@ -0,0 +1,272 @@
+import argparse
+import os
+import sys
+
+from clientes import cargar_entorno
+
+# --------------------------------
+# Línea de comandos: un subcomando por parte del flujo.
+# Los módulos de trabajo se importan dentro de cada subcomando para que
+# el arranque solo pague lo que usa.
+# --------------------------------
+
+
+def cmd_generate(args):
+    from almacenamiento_s3 import guardar_datos_generados
+
+    guardar_datos_generados(args.registros, args.formatos, args.semilla)
+
+
+def cmd_upload(args):
+    from almacenamiento_s3 import asegurar_bucket, asegurar_carpeta, subir_datos_generados
+
+    asegurar_bucket(args.bucket)
+    asegurar_carpeta(args.bucket)
+    subir_datos_generados(args.formatos, args.bucket)
+
+
+def cmd_athena(args):
+    import almacenamiento_s3
+
+    if args.consulta:
+        from consultas_locales import ejecutar_consulta
+
+        ejecutar_consulta(args.consulta, motor=args.motor)
+    elif args.solo_consultas:
+        almacenamiento_s3.ejecutar_consultas(almacenamiento_s3.CONSULTAS_CSV, args.motor)
+        almacenamiento_s3.ejecutar_consultas(almacenamiento_s3.CONSULTAS_FUENTES_JSON, args.motor)
+    else:
+        almacenamiento_s3.flujo_athena()
+
+
+def cmd_buscar(args):
+    from indices import IndiceEstudiantes, buscar_estudiantes, valor_busqueda
+
+    for valor in (args.igual, args.desde, args.hasta):
+        try:
+            valor_busqueda(args.columna, valor)
+        except ValueError as e:
+            print(f"almacenamiento buscar: error: {e}", file=sys.stderr)
+            sys.exit(2)
+    if args.key:
+        indice = IndiceEstudiantes(args.bucket, args.key)
+        filas = indice.buscar(args.columna, args.igual, args.desde, args.hasta, args.estricto)
+    else:
+        filas = buscar_estudiantes(
+            args.columna, args.igual, args.desde, args.hasta, args.estricto, nombre_bucket=args.bucket
+        )
+    for fila in filas:
+        print(fila)
+    print(f"{len(filas)} filas encontradas")
+
+
+def cmd_perfil(args):
+    import json
+
+    from perfil_athena import informe, mostrar_informe
+
+    if args.json:
+        print(json.dumps(informe(args.huella), indent=2, ensure_ascii=False))
+    else:
+        mostrar_informe(args.huella)
+
+
+def cmd_ingesta(args):
+    from ingesta import ingerir_archivo, ingerir_stdin
+
+    opciones = dict(
+        nombre_bucket=args.bucket,
+        formatos=args.formatos,
+        max_registros=args.max_registros,
+        max_segundos=args.max_segundos,
+        formato_entrada=args.formato_entrada,
+    )
+    if args.archivo:
+        ingerir_archivo(args.archivo, **opciones)
+    else:
+        ingerir_stdin(**opciones)
+
+
+def cmd_tiering(args):
+    from almacenamiento_s3 import probar_clases_almacenamiento, probar_versionado
+
+    probar_clases_almacenamiento()
+    probar_versionado()
+
+
+def cmd_ec2(args):
+    from almacenamiento_ec2 import EC2Manager, contar_instancias
+
+    if args.accion == "contar":
+        contar_instancias()
+        return
+    ec2_manager = EC2Manager(ami_id=args.ami, instance_type=args.tipo, instance_name=args.nombre)
+    if args.accion == "crear":
+        ec2_manager.crear_instancia()
+        ec2_manager.aplicar_etiqueta()
+        ec2_manager.esperar_estado("running")
+    elif args.accion == "parar":
+        ec2_manager.parar_instancia(instance_id=args.instance_id)
+    elif args.accion == "eliminar":
+        ec2_manager.eliminar_instancia(instance_id=args.instance_id)
+
+
+def cmd_ebs(args):
+    from almacenamiento_ec2 import EC2Manager
+
+    ec2_manager = EC2Manager(ami_id=None)
+    ec2_manager.provisionar_volumenes_ebs(
+        instance_ids=args.instance_id,
+        volumenes_por_instancia=args.volumenes,
+        size_gb=args.size,
+        perfil=args.perfil,
+        iops=args.iops,
+        throughput=args.throughput,
+        benchmark=args.benchmark,
+        max_workers=args.workers,
+    )
+
+
+def cmd_efs(args):
+    from almacenamiento_ec2 import EC2Manager
+
+    ec2_manager = EC2Manager(ami_id=None)
+    instance_ip = args.ip or ec2_manager.obtener_ip_publica(instance_id=args.instance_id)
+    ec2_manager.crear_efs_y_montar_en_instancia(
+        instance_ip=instance_ip,
+        instance_id=args.instance_id,
+        subnet_ids=args.subnet,
+        performance_mode=args.performance_mode,
+        throughput_mode=args.throughput_mode,
+        provisioned_throughput=args.provisioned_throughput,
+    )
+
+
+def cmd_pipeline(args):
+    from pipeline import crear_pipeline_estudiantes
+
+    pipeline = crear_pipeline_estudiantes(args.registros, args.semilla)
+    if args.listar:
+        for nombre in pipeline.etapas:
+            print(nombre)
+        return
+    forzar = list(pipeline.etapas) if args.forzar == ["todas"] else args.forzar
+    pipeline.ejecutar(solo=args.solo, forzar=forzar)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="almacenamiento",
+        description="Gestión de almacenamiento en AWS: S3, Athena, EC2, EBS y EFS",
+    )
+    parser.add_argument("--metricas", metavar="CARPETA", help="Exportar métricas de llamadas AWS a la carpeta")
+    parser.add_argument("--puerto-metricas", type=int, help="Servir métricas Prometheus en este puerto")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p = subparsers.add_parser("generate", help="Generar datos sintéticos de estudiantes en local")
+    p.add_argument("--registros", type=int, default=100)
+    p.add_argument("--semilla", type=int, help="Semilla de Faker para datos reproducibles")
+    p.add_argument("--formatos", nargs="+", choices=["csv", "json", "parquet"], default=["csv", "json"])
+    p.set_defaults(func=cmd_generate)
+
+    p = subparsers.add_parser("upload", help="Subir los datos generados y la fuente JSON a S3")
+    p.add_argument("--bucket", default="gestion-practicas-bucket", help="Las tablas de Athena leen gestion-practicas-bucket")
+    # Solo los formatos que tienen tabla en Athena y en el motor local
+    p.add_argument("--formatos", nargs="+", choices=["csv", "json"], default=["csv", "json"])
+    p.set_defaults(func=cmd_upload)
+
+    p = subparsers.add_parser("athena", help="Crear tablas y ejecutar las consultas en Athena")
+    p.add_argument("--solo-consultas", action="store_true", help="No recrear las tablas")
+    p.add_argument("--consulta", help="Ejecutar solo esta consulta SQL")
+    p.add_argument(
+        "--motor", choices=["auto", "local", "athena"], default="auto",
+        help="Motor de consultas; 'auto' usa el local cuando los datos son pequeños",
+    )
+    p.set_defaults(func=cmd_athena)
+
+    p = subparsers.add_parser("buscar", help="Buscar estudiantes en el CSV con los índices secundarios, sin Athena")
+    p.add_argument("columna", choices=["titulacion", "id_centro", "fecha_nacimiento"])
+    p.add_argument("--igual", help="Valor exacto")
+    p.add_argument("--desde", help="Valor mínimo")
+    p.add_argument("--hasta", help="Valor máximo")
+    p.add_argument("--estricto", action="store_true", help="Excluir los valores desde/hasta")
+    p.add_argument("--bucket")
+    p.add_argument("--key", help="Buscar solo en este CSV (por defecto en todos los de gestion/csv/, incluidas las partes de la ingesta)")
+    p.set_defaults(func=cmd_buscar)
+
+    p = subparsers.add_parser("ingesta", help="Ingesta continua de registros nuevos en micro-lotes")
+    p.add_argument("--archivo", help="Seguir este archivo mientras crece (por defecto se lee la entrada estándar)")
+    p.add_argument("--formato-entrada", choices=["json", "csv"], default="json", help="Una línea JSON o CSV sin cabecera por registro")
+    p.add_argument("--formatos", nargs="+", choices=["csv", "json"], default=["csv", "json"], help="Tablas a las que se añaden los datos")
+    p.add_argument("--max-registros", type=int, default=1000, help="Registros por micro-lote")
+    p.add_argument("--max-segundos", type=float, default=5.0, help="Antigüedad máxima de un micro-lote antes de subirlo")
+    p.add_argument("--bucket")
+    p.set_defaults(func=cmd_ingesta)
+
+    p = subparsers.add_parser("perfil", help="Informe de coste, tiempos y regresiones de las consultas ejecutadas")
+    p.add_argument("--huella", help="Mostrar solo las ejecuciones de esta huella de SQL")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.set_defaults(func=cmd_perfil)
+
+    p = subparsers.add_parser("pipeline", help="Flujo completo por etapas, saltando las que no han cambiado")
+    p.add_argument("--registros", type=int, default=100)
+    p.add_argument("--semilla", type=int, default=42, help="Semilla de Faker para datos reproducibles")
+    p.add_argument("--solo", nargs="+", metavar="ETAPA", help="Ejecutar solo estas etapas y sus dependencias")
+    p.add_argument("--forzar", nargs="+", default=[], metavar="ETAPA", help="Repetir estas etapas ('todas' para todas)")
+    p.add_argument("--listar", action="store_true", help="Mostrar las etapas disponibles")
+    p.set_defaults(func=cmd_pipeline)
+
+    p = subparsers.add_parser("tiering", help="Probar clases de almacenamiento y versionado")
+    p.set_defaults(func=cmd_tiering)
+
+    p = subparsers.add_parser("ec2", help="Gestionar instancias EC2")
+    p.add_argument("accion", choices=["contar", "crear", "parar", "eliminar"])
+    p.add_argument("--instance-id", default=os.getenv("INSTANCE_ID"))
+    p.add_argument("--ami", default="ami-07ff62358b87c7116")
+    p.add_argument("--tipo", default="t3.micro")
+    p.add_argument("--nombre", default="test-instance")
+    p.set_defaults(func=cmd_ec2)
+
+    p = subparsers.add_parser("ebs", help="Provisionar volúmenes EBS en paralelo")
+    p.add_argument("--instance-id", nargs="+", required=True)
+    p.add_argument("--volumenes", type=int, default=1, help="Volúmenes por instancia")
+    p.add_argument("--size", type=int, default=1, help="Tamaño en GiB")
+    p.add_argument("--perfil", default="gp3")
+    p.add_argument("--iops", type=int)
+    p.add_argument("--throughput", type=int, help="MiB/s")
+    p.add_argument("--benchmark", action="store_true")
+    p.add_argument("--workers", type=int, default=8)
+    p.set_defaults(func=cmd_ebs)
+
+    p = subparsers.add_parser("efs", help="Crear o reutilizar un EFS y montarlo en una instancia")
+    p.add_argument("--instance-id", required=True)
+    p.add_argument("--ip", help="IP de la instancia (por defecto la IP pública)")
+    p.add_argument("--subnet", nargs="*", default=[], help="Subredes adicionales para puntos de montaje")
+    p.add_argument("--performance-mode", choices=["generalPurpose", "maxIO"], default="generalPurpose")
+    p.add_argument("--throughput-mode", choices=["bursting", "elastic", "provisioned"], default="elastic")
+    p.add_argument("--provisioned-throughput", type=float, help="MiB/s en modo provisioned")
+    p.set_defaults(func=cmd_efs)
+
+    return parser
+
+
+def main(argv=None):
+    cargar_entorno()
+    args = crear_parser().parse_args(argv)
+
+    instrumentacion = None
+    if args.metricas or args.puerto_metricas:
+        import instrumentacion as modulo_instrumentacion
+
+        instrumentacion = modulo_instrumentacion.activar()
+        if args.puerto_metricas:
+            instrumentacion.servir_prometheus(args.puerto_metricas)
+    try:
+        args.func(args)
+    finally:
+        if instrumentacion and args.metricas:
+            instrumentacion.exportar(args.metricas)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+import threading
+
+# --------------------------------
+# Sesión y clientes AWS compartidos, creados bajo demanda.
+# --------------------------------
+
+# boto3 y botocore se importan dentro de las funciones para que importar
+# este módulo (y los que dependen de él) no cueste nada hasta la primera
+# llamada a AWS.
+
+_lock = threading.Lock()
+_entorno_cargado = False
+_session = None
+_clientes = {}
+_recursos = {}
+
+
+def cargar_entorno():
+    """Cargar las variables del archivo .env (una sola vez)"""
+    global _entorno_cargado
+    if not _entorno_cargado:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _entorno_cargado = True
+
+
+def configuracion_clientes():
+    """Configuración compartida: pool de conexiones amplio, reintentos adaptativos y keep-alive"""
+    # Pocos reintentos en botocore: el throttling persistente lo reintenta
+    # control_ritmo con su presupuesto global, sin multiplicar intentos
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=int(os.getenv("MAX_POOL_CONNECTIONS", "50")),
+        retries={"mode": "adaptive", "max_attempts": 3},
+        tcp_keepalive=True,
+    )
+
+
+def obtener_sesion():
+    """Obtener la sesión boto3 del proceso (se crea una sola vez)"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import boto3
+
+                cargar_entorno()
+                _session = boto3.Session(
+                    aws_access_key_id=os.getenv("ACCESS_KEY"),
+                    aws_secret_access_key=os.getenv("SECRET_KEY"),
+                    aws_session_token=os.getenv("SESSION_TOKEN"),
+                    region_name=os.getenv("REGION"),
+                )
+    return _session
+
+
+def obtener_cliente(servicio):
+    """Obtener el cliente compartido de un servicio (s3, athena, ec2, efs...)"""
+    cliente = _clientes.get(servicio)
+    if cliente is None:
+        sesion = obtener_sesion()
+        with _lock:
+            cliente = _clientes.get(servicio)
+            if cliente is None:
+                cliente = sesion.client(servicio, config=configuracion_clientes())
+                _clientes[servicio] = cliente
+    return cliente
+
+
+def obtener_recurso(servicio):
+    """Obtener el recurso compartido de un servicio (por ejemplo s3)"""
+    recurso = _recursos.get(servicio)
+    if recurso is None:
+        sesion = obtener_sesion()
+        with _lock:
+            recurso = _recursos.get(servicio)
+            if recurso is None:
+                recurso = sesion.resource(servicio, config=configuracion_clientes())
+                _recursos[servicio] = recurso
+    return recurso
+
+
+def clientes_creados():
+    """Clientes botocore creados hasta ahora (incluidos los de los recursos)"""
+    with _lock:
+        return list(_clientes.values()) + [r.meta.client for r in _recursos.values()]
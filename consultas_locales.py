@@ -0,0 +1,302 @@
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from clientes import obtener_cliente
+from lector_s3 import LectorS3
+
+# --------------------------------
+# Motor de consultas local: carga en SQLite en memoria las tablas externas
+# definidas para Athena (leyendo sus objetos de S3 en streaming) y ejecuta el mismo SQL.
+# El enrutador decide por consulta si es más barato usar el motor local o
+# Athena según el tamaño de los datos a leer.
+# --------------------------------
+
+# Por encima de este tamaño las consultas van siempre a Athena
+MAX_BYTES_LOCAL = int(os.getenv('MAX_MB_CONSULTA_LOCAL', '256')) * 1024 * 1024
+# Estimaciones para comparar ambos motores
+LATENCIA_ATHENA_S = 2.0
+RENDIMIENTO_CARGA_LOCAL_BPS = 20 * 1024 * 1024
+PRECIO_ATHENA_POR_TB = 5.0
+MINIMO_FACTURADO_ATHENA = 10 * 1024 * 1024
+
+TIPOS_SQLITE = {
+    'TINYINT': 'INTEGER', 'SMALLINT': 'INTEGER', 'INT': 'INTEGER', 'INTEGER': 'INTEGER',
+    'BIGINT': 'INTEGER', 'BOOLEAN': 'INTEGER',
+    'FLOAT': 'REAL', 'DOUBLE': 'REAL', 'DECIMAL': 'REAL',
+}
+
+
+def _definicion_tabla(ddl):
+    """Extraer nombre, columnas, ubicación y formato de un CREATE EXTERNAL TABLE"""
+    nombre = re.search(r'EXISTS\s+([\w.]+)\s*\(', ddl).group(1)
+    cuerpo = ddl[ddl.index('(') + 1:ddl.index('ROW FORMAT')]
+    cuerpo = cuerpo[:cuerpo.rindex(')')]
+    columnas = []
+    for linea in cuerpo.split(','):
+        partes = linea.split()
+        if partes:
+            columnas.append((partes[0], partes[1].upper()))
+    bucket, prefijo = re.search(r"LOCATION\s+'s3://([^/]+)/([^']*)'", ddl).groups()
+    return {
+        'nombre': nombre,
+        'columnas': columnas,
+        'bucket': bucket,
+        'prefijo': prefijo,
+        'formato': 'csv' if 'OpenCSVSerde' in ddl else 'json',
+        'saltar_cabecera': "'skip.header.line.count'='1'" in ddl,
+    }
+
+
+def catalogo_tablas():
+    """Tablas conocidas por el motor local, a partir del DDL de Athena"""
+    from almacenamiento_s3 import CREATE_TABLE_CSV, CREATE_TABLE_FUENTES_JSON, CREATE_TABLE_JSON
+
+    tablas = [_definicion_tabla(ddl) for ddl in (CREATE_TABLE_CSV, CREATE_TABLE_JSON, CREATE_TABLE_FUENTES_JSON)]
+    return {tabla['nombre']: tabla for tabla in tablas}
+
+
+def _convertir(valor, tipo):
+    """Convertir un valor leído (texto en CSV) al tipo declarado de la columna"""
+    if valor is None or valor == '':
+        return None
+    try:
+        if tipo == 'BOOLEAN':
+            return int(valor if isinstance(valor, bool) else str(valor).lower() == 'true')
+        if TIPOS_SQLITE.get(tipo) == 'INTEGER':
+            return int(valor)
+        if TIPOS_SQLITE.get(tipo) == 'REAL':
+            return float(valor)
+    except ValueError:
+        # Igual que Athena: un valor que no encaja en el tipo se lee como NULL
+        return None
+    return valor
+
+
+def _filas_objeto(tabla, key, lector):
+    """Leer en streaming las filas de un objeto de la tabla según su formato"""
+    nombres = [nombre for nombre, _ in tabla['columnas']]
+    if key.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError(f"Para leer {key} en local es necesario instalar pyarrow (pip install -r requirements-parquet.txt).")
+        archivo = pq.ParquetFile(lector)
+        for lote in archivo.iter_batches(columns=[nombre for nombre in nombres if nombre in archivo.schema_arrow.names]):
+            for registro in lote.to_pylist():
+                yield [registro.get(nombre) for nombre in nombres]
+    elif tabla['formato'] == 'csv':
+        lector_csv = csv.reader(io.TextIOWrapper(lector, encoding='utf-8', newline=''))
+        if tabla['saltar_cabecera']:
+            next(lector_csv, None)
+        for fila in lector_csv:
+            if fila:
+                yield fila[:len(nombres)] + [None] * (len(nombres) - len(fila))
+    else:
+        for linea in lector:
+            if linea.strip():
+                registro = json.loads(linea)
+                if isinstance(registro, dict):
+                    yield [registro.get(nombre) for nombre in nombres]
+
+
+class MotorLocal:
+    def __init__(self, catalogo=None):
+        self.catalogo = catalogo or catalogo_tablas()
+        self.conexion = sqlite3.connect(':memory:', check_same_thread=False)
+        # LIKE distingue mayúsculas en Athena; en SQLite no, salvo con este pragma
+        self.conexion.execute('PRAGMA case_sensitive_like = ON')
+        # Versión (ETags) de los objetos con la que se cargó cada tabla
+        self.versiones = {}
+        self._lock = threading.Lock()
+
+    def listar_objetos(self, nombre_tabla):
+        """Objetos de datos de una tabla: [(key, etag, tamaño)]"""
+        tabla = self.catalogo[nombre_tabla]
+        s3_client = obtener_cliente('s3')
+        objetos = []
+        for pagina in s3_client.get_paginator('list_objects_v2').paginate(
+            Bucket=tabla['bucket'], Prefix=tabla['prefijo']
+        ):
+            for obj in pagina.get('Contents', []):
+                # Athena ignora las "carpetas" y los archivos ocultos
+                nombre = obj['Key'][len(tabla['prefijo']):]
+                if nombre and not nombre.endswith('/') and not nombre.startswith(('_', '.')):
+                    objetos.append((obj['Key'], obj['ETag'], obj['Size']))
+        return objetos
+
+    def _cargar_tabla(self, nombre_tabla, objetos):
+        tabla = self.catalogo[nombre_tabla]
+        columnas = ', '.join(f'"{nombre}" {TIPOS_SQLITE.get(tipo, "TEXT")}' for nombre, tipo in tabla['columnas'])
+        tipos = [tipo for _, tipo in tabla['columnas']]
+        self.conexion.execute(f'DROP TABLE IF EXISTS "{nombre_tabla}"')
+        self.conexion.execute(f'CREATE TABLE "{nombre_tabla}" ({columnas})')
+        marcadores = ', '.join('?' for _ in tipos)
+        for key, _, _ in objetos:
+            with LectorS3(tabla['bucket'], key) as lector:
+                filas = (
+                    [_convertir(valor, tipo) for valor, tipo in zip(fila, tipos)]
+                    for fila in _filas_objeto(tabla, key, lector)
+                )
+                self.conexion.executemany(f'INSERT INTO "{nombre_tabla}" VALUES ({marcadores})', filas)
+        self.conexion.commit()
+        print(f"Tabla {nombre_tabla} cargada en el motor local ({len(objetos)} objetos)")
+
+    def asegurar_tabla(self, nombre_tabla, objetos=None):
+        """Cargar la tabla si no está cargada o si sus objetos han cambiado en S3"""
+        objetos = objetos if objetos is not None else self.listar_objetos(nombre_tabla)
+        version = sorted((key, etag) for key, etag, _ in objetos)
+        with self._lock:
+            if self.versiones.get(nombre_tabla) != version:
+                self._cargar_tabla(nombre_tabla, objetos)
+                self.versiones[nombre_tabla] = version
+
+    def ejecutar(self, query, tablas, objetos_por_tabla=None):
+        """Ejecutar una consulta sobre las tablas indicadas: (columnas, filas)"""
+        objetos_por_tabla = objetos_por_tabla or {}
+        for nombre_tabla in tablas:
+            self.asegurar_tabla(nombre_tabla, objetos_por_tabla.get(nombre_tabla))
+        sql = query
+        for nombre_tabla in tablas:
+            sql = re.sub(rf'(?<![\w."]){re.escape(nombre_tabla)}(?![\w"])', f'"{nombre_tabla}"', sql, flags=re.IGNORECASE)
+        with self._lock:
+            cursor = self.conexion.execute(sql)
+            columnas = [descripcion[0] for descripcion in cursor.description or []]
+            return columnas, cursor.fetchall()
+
+
+def tablas_consulta(query, catalogo):
+    """Tablas del catálogo a las que hace referencia una consulta"""
+    return [
+        nombre for nombre in catalogo
+        if re.search(rf'(?<![\w.]){re.escape(nombre)}(?!\w)', query, re.IGNORECASE)
+    ]
+
+
+def estimar_coste(bytes_datos, bytes_por_cargar):
+    """Estimación de tiempo (s) de cada motor y coste de Athena (USD)"""
+    return {
+        # El motor local solo paga la carga de las tablas que no tiene al día
+        'local_s': bytes_por_cargar / RENDIMIENTO_CARGA_LOCAL_BPS,
+        'athena_s': LATENCIA_ATHENA_S,
+        'athena_usd': max(bytes_datos, MINIMO_FACTURADO_ATHENA) / 1024 ** 4 * PRECIO_ATHENA_POR_TB,
+    }
+
+
+class EnrutadorConsultas:
+    def __init__(self, motor_local=None):
+        self._motor_local = motor_local
+
+    @property
+    def motor_local(self):
+        if self._motor_local is None:
+            self._motor_local = MotorLocal()
+        return self._motor_local
+
+    def decidir(self, query):
+        """Elegir 'local' o 'athena' para una consulta: (motor, motivo, tablas, objetos)"""
+        if not re.match(r'\s*(SELECT|WITH)\b', query, re.IGNORECASE):
+            return 'athena', 'no es una consulta de lectura', [], {}
+        catalogo = self.motor_local.catalogo
+        tablas = tablas_consulta(query, catalogo)
+        if not tablas:
+            return 'athena', 'tabla desconocida para el motor local', [], {}
+
+        objetos = {nombre: self.motor_local.listar_objetos(nombre) for nombre in tablas}
+        bytes_datos = sum(tamano for lista in objetos.values() for _, _, tamano in lista)
+        bytes_por_cargar = sum(
+            tamano for nombre, lista in objetos.items() for _, _, tamano in lista
+            if self.motor_local.versiones.get(nombre) != sorted((key, etag) for key, etag, _ in lista)
+        )
+        if bytes_datos > MAX_BYTES_LOCAL:
+            return 'athena', f'{bytes_datos / 1024 ** 2:.1f} MiB superan el límite local', tablas, objetos
+        coste = estimar_coste(bytes_datos, bytes_por_cargar)
+        if coste['local_s'] >= coste['athena_s']:
+            return 'athena', f"estimado local {coste['local_s']:.1f}s >= Athena {coste['athena_s']:.1f}s", tablas, objetos
+        return 'local', f"{bytes_datos / 1024:.1f} KiB, ahorro estimado {coste['athena_s'] - coste['local_s']:.1f}s", tablas, objetos
+
+    def ejecutar_local(self, query, descripcion, tablas, objetos, carpeta):
+        """Ejecutar en el motor local y devolver un resultado con la forma de QueryExecution"""
+        from almacenamiento_s3 import crear_carpeta_local
+        from perfil_athena import registrar_consulta
+
+        inicio = time.perf_counter()
+        columnas, filas = self.motor_local.ejecutar(query, tablas, objetos)
+        milisegundos = int((time.perf_counter() - inicio) * 1000)
+
+        # Mismo formato que el CSV de resultados de Athena
+        query_execution_id = f'local-{uuid.uuid4()}'
+        crear_carpeta_local(carpeta)
+        local_file = os.path.join(carpeta, f'{query_execution_id}.csv')
+        with open(local_file, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+            writer.writerow(columnas)
+            writer.writerows(filas)
+
+        print(f"{descripcion.capitalize()} completada en el motor local ({len(filas)} filas, {milisegundos} ms)")
+        execution = {
+            'QueryExecutionId': query_execution_id,
+            'Query': query,
+            'Motor': 'local',
+            'Status': {'State': 'SUCCEEDED'},
+            'Statistics': {
+                'EngineExecutionTimeInMillis': milisegundos,
+                'DataScannedInBytes': sum(tamano for lista in objetos.values() for _, _, tamano in lista),
+            },
+            'ResultadoLocal': local_file,
+            'Columnas': columnas,
+            'Filas': filas,
+        }
+        registrar_consulta(execution, descripcion)
+        return execution
+
+    def ejecutar(self, query, descripcion='consulta', motor='auto', carpeta=None):
+        """Ejecutar una consulta en el motor elegido ('auto', 'local' o 'athena')"""
+        from almacenamiento_s3 import download_folder, ejecutar_consulta_athena
+
+        if motor not in ('auto', 'local', 'athena'):
+            raise ValueError(f"Motor de consultas desconocido: {motor}")
+        if motor == 'athena':
+            return ejecutar_consulta_athena(query, descripcion)
+
+        elegido, motivo, tablas, objetos = self.decidir(query)
+        if motor == 'local':
+            if not tablas:
+                raise ValueError(f"La {descripcion} no se puede ejecutar en local: {motivo}.")
+            elegido = 'local'
+        print(f"{descripcion.capitalize()} -> {elegido} ({motivo})")
+        if elegido == 'athena':
+            return ejecutar_consulta_athena(query, descripcion)
+        try:
+            return self.ejecutar_local(query, descripcion, tablas, objetos, carpeta or download_folder)
+        except sqlite3.Error as e:
+            if motor == 'local':
+                raise
+            # SQL que SQLite no entiende (funciones propias de Presto/Trino): se delega en Athena
+            print(f"El motor local no admite la {descripcion} ({e}); se ejecuta en Athena.")
+            return ejecutar_consulta_athena(query, descripcion)
+
+
+_enrutador = None
+_lock_enrutador = threading.Lock()
+
+
+def obtener_enrutador():
+    """Enrutador de consultas compartido del proceso"""
+    global _enrutador
+    if _enrutador is None:
+        with _lock_enrutador:
+            if _enrutador is None:
+                _enrutador = EnrutadorConsultas()
+    return _enrutador
+
+
+def ejecutar_consulta(query, descripcion='consulta', motor='auto'):
+    """Atajo para ejecutar una consulta con el enrutador compartido"""
+    return obtener_enrutador().ejecutar(query, descripcion, motor)
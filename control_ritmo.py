@@ -0,0 +1,235 @@
+import random
+import threading
+import time
+
+from instrumentacion import CODIGOS_THROTTLING
+
+# --------------------------------
+# Control de ritmo compartido por todo el proceso: un cubo de tokens por
+# servicio (y por prefijo en S3) cuya tasa se ajusta con AIMD ante señales
+# de throttling, y un presupuesto global de reintentos.
+# --------------------------------
+
+# Tasas por servicio (peticiones/s): inicial, mínima y máxima
+TASAS_SERVICIO = {
+    'athena': (5.0, 0.5, 20.0),
+    'ec2': (10.0, 1.0, 100.0),
+    'efs': (5.0, 0.5, 25.0),
+    # S3 escala por prefijo (3.500 PUT y 5.500 GET por segundo y prefijo)
+    's3': (200.0, 10.0, 3500.0),
+}
+TASAS_POR_DEFECTO = (10.0, 1.0, 100.0)
+
+# Peticiones/s que gana un cubo por cada segundo sin throttling
+INCREMENTO_ADITIVO = 5.0
+
+MAX_INTENTOS = 8
+ESPERA_BASE_S = 0.2
+ESPERA_MAXIMA_S = 20.0
+
+
+class ThrottlingExterno(Exception):
+    """Throttling detectado fuera de botocore (por ejemplo, un GET con curl que recibe un 503)"""
+
+
+def es_throttling(error):
+    """Indicar si una excepción, o alguna de las que envuelve, es una señal de throttling.
+
+    s3transfer no deja pasar el ClientError: upload_file lo convierte en
+    S3UploadFailedError (queda en __context__) y download_file lo guarda en
+    RetriesExceededError.last_exception.
+    """
+    vistos = set()
+    while error is not None and id(error) not in vistos:
+        vistos.add(id(error))
+        if isinstance(error, ThrottlingExterno):
+            return True
+        respuesta = getattr(error, 'response', None) or {}
+        codigo = respuesta.get('Error', {}).get('Code')
+        estado = respuesta.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if codigo in CODIGOS_THROTTLING or estado in (429, 503):
+            return True
+        error = getattr(error, 'last_exception', None) or error.__cause__ or error.__context__
+    return False
+
+
+def clave_s3(bucket, key=''):
+    """Clave de ritmo para S3: bucket y prefijo (la ruta hasta la última '/')"""
+    prefijo = key.rsplit('/', 1)[0] if '/' in key else ''
+    return f's3:{bucket}/{prefijo}'
+
+
+class CuboTokens:
+    def __init__(self, tasa, tasa_minima, tasa_maxima):
+        self.tasa = tasa
+        self.tasa_minima = tasa_minima
+        self.tasa_maxima = tasa_maxima
+        self.capacidad = max(1.0, tasa)
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self.ultima_reduccion = 0.0
+        self._lock = threading.Lock()
+
+    def _rellenar(self, ahora):
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+
+    def adquirir(self):
+        """Esperar hasta disponer de un token"""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._rellenar(ahora)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.tasa
+            time.sleep(espera)
+
+    def exito(self):
+        """Incremento aditivo de la tasa"""
+        with self._lock:
+            self.tasa = min(self.tasa_maxima, self.tasa + INCREMENTO_ADITIVO / self.tasa)
+            self.capacidad = max(1.0, self.tasa)
+
+    def throttle(self):
+        """Reducción multiplicativa de la tasa (como mucho una vez por segundo)"""
+        with self._lock:
+            ahora = time.monotonic()
+            if ahora - self.ultima_reduccion < 1.0:
+                return
+            self.ultima_reduccion = ahora
+            self._rellenar(ahora)
+            self.tasa = max(self.tasa_minima, self.tasa * 0.5)
+            self.capacidad = max(1.0, self.tasa)
+            self.tokens = min(self.tokens, self.capacidad)
+
+
+class PresupuestoReintentos:
+    def __init__(self, ratio=0.1, minimo=10.0, maximo=100.0):
+        self.ratio = ratio
+        self.maximo = maximo
+        self.saldo = minimo
+        self._lock = threading.Lock()
+
+    def depositar(self):
+        """Cada llamada con éxito aporta una fracción de reintento"""
+        with self._lock:
+            self.saldo = min(self.maximo, self.saldo + self.ratio)
+
+    def retirar(self):
+        """Consumir un reintento; False si el presupuesto está agotado"""
+        with self._lock:
+            if self.saldo < 1:
+                return False
+            self.saldo -= 1
+            return True
+
+
+class ControlRitmo:
+    def __init__(self):
+        self.presupuesto = PresupuestoReintentos()
+        self.cubos = {}
+        self._lock = threading.Lock()
+
+    def cubo(self, clave):
+        """Cubo de tokens de una clave ('athena', 'ec2', 's3:bucket/prefijo'...)"""
+        cubo = self.cubos.get(clave)
+        if cubo is None:
+            with self._lock:
+                cubo = self.cubos.get(clave)
+                if cubo is None:
+                    servicio = clave.split(':', 1)[0]
+                    cubo = CuboTokens(*TASAS_SERVICIO.get(servicio, TASAS_POR_DEFECTO))
+                    self.cubos[clave] = cubo
+        return cubo
+
+    def ejecutar(self, clave, funcion, *args, **kwargs):
+        """Ejecutar una llamada respetando el ritmo de su clave y reintentando el throttling"""
+        cubo = self.cubo(clave)
+        for intento in range(MAX_INTENTOS):
+            cubo.adquirir()
+            try:
+                resultado = funcion(*args, **kwargs)
+            except Exception as e:
+                if not es_throttling(e):
+                    raise
+                cubo.throttle()
+                if intento == MAX_INTENTOS - 1 or not self.presupuesto.retirar():
+                    raise
+                espera = min(ESPERA_MAXIMA_S, ESPERA_BASE_S * 2 ** intento)
+                time.sleep(random.uniform(0, espera))
+                continue
+            cubo.exito()
+            self.presupuesto.depositar()
+            return resultado
+
+
+class PaginadorConRitmo:
+    """Envoltorio de un paginador boto3 que adquiere un token antes de pedir cada página"""
+
+    def __init__(self, paginador, clave):
+        self._paginador = paginador
+        self._clave = clave
+
+    def paginate(self, **kwargs):
+        """Recorrer las páginas al ritmo de la clave (generador de páginas)"""
+        cubo = obtener_control_ritmo().cubo(self._clave)
+        paginas = iter(self._paginador.paginate(**kwargs))
+        while True:
+            cubo.adquirir()
+            try:
+                pagina = next(paginas)
+            except StopIteration:
+                return
+            except Exception as e:
+                # La página no se puede repetir sin rehacer la paginación: se
+                # reduce la tasa y se propaga el error
+                if es_throttling(e):
+                    cubo.throttle()
+                raise
+            cubo.exito()
+            yield pagina
+
+
+class ClienteConRitmo:
+    """Envoltorio de un cliente boto3 cuyas operaciones pasan por el control de ritmo"""
+
+    # Atributos que no son llamadas a la API
+    SIN_RITMO = {'meta', 'exceptions', 'get_waiter', 'can_paginate', 'generate_presigned_url', 'close'}
+
+    def __init__(self, cliente, clave):
+        self._cliente = cliente
+        self._clave = clave
+
+    def get_paginator(self, operacion):
+        return PaginadorConRitmo(self._cliente.get_paginator(operacion), self._clave)
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._cliente, nombre)
+        if nombre in self.SIN_RITMO or nombre.startswith('_') or not callable(atributo):
+            return atributo
+
+        def llamada(*args, **kwargs):
+            return obtener_control_ritmo().ejecutar(self._clave, atributo, *args, **kwargs)
+
+        return llamada
+
+
+_control_ritmo = None
+_lock_global = threading.Lock()
+
+
+def obtener_control_ritmo():
+    """Control de ritmo compartido del proceso"""
+    global _control_ritmo
+    if _control_ritmo is None:
+        with _lock_global:
+            if _control_ritmo is None:
+                _control_ritmo = ControlRitmo()
+    return _control_ritmo
+
+
+def ejecutar(clave, funcion, *args, **kwargs):
+    """Atajo para ejecutar una llamada con el control de ritmo compartido"""
+    return obtener_control_ritmo().ejecutar(clave, funcion, *args, **kwargs)
@@ -0,0 +1,272 @@
+import base64
+import bisect
+import csv
+import hashlib
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from clientes import obtener_cliente
+from control_ritmo import ClienteConRitmo, clave_s3, ejecutar
+from subidas import no_existe, precondicion_fallida, subir_contenido
+
+# --------------------------------
+# Índices secundarios del CSV de estudiantes: junto a cada objeto de datos
+# se guardan, fuera de la LOCATION de la tabla para que Athena no los lea,
+#   - resumen.json: ETag del CSV y, por columna, mínimo, máximo y un filtro
+#     de Bloom de sus valores;
+#   - <columna>.json: valores ordenados con los rangos de bytes de sus filas.
+# Una búsqueda lee el resumen, descarta lo que no puede coincidir, consulta
+# el índice de la columna y pide solo los rangos de bytes de las filas.
+# --------------------------------
+
+# Columnas indexadas y cómo convertir sus valores para ordenarlos
+COLUMNAS_INDICE = {
+    'titulacion': str,
+    'id_centro': int,
+    'fecha_nacimiento': str,
+}
+
+BITS_POR_VALOR_BLOOM = 10
+FUNCIONES_BLOOM = 7
+# Rangos separados por menos de esto se piden en un único GET
+HUECO_MAXIMO_RANGOS = 64 * 1024
+
+
+def prefijo_indices(key):
+    """Prefijo de los índices de un objeto: gestion/csv/x.csv -> gestion/indices/csv/x.csv/"""
+    from almacenamiento_s3 import folder_name
+
+    relativo = key[len(folder_name):] if key.startswith(folder_name) else key
+    return f'{folder_name}indices/{relativo}/'
+
+
+def _posiciones_bloom(valor, bits):
+    resumen = hashlib.sha256(str(valor).encode('utf-8')).digest()
+    return [int.from_bytes(resumen[i * 4:i * 4 + 4], 'big') % bits for i in range(FUNCIONES_BLOOM)]
+
+
+def crear_bloom(valores):
+    """Filtro de Bloom de un conjunto de valores"""
+    bits = max(64, len(valores) * BITS_POR_VALOR_BLOOM)
+    filtro = bytearray((bits + 7) // 8)
+    for valor in valores:
+        for posicion in _posiciones_bloom(valor, bits):
+            filtro[posicion // 8] |= 1 << (posicion % 8)
+    return {'bits': bits, 'filtro': base64.b64encode(bytes(filtro)).decode('ascii')}
+
+
+def puede_contener(bloom, valor):
+    """False si el valor seguro que no está; True si puede estar"""
+    filtro = base64.b64decode(bloom['filtro'])
+    return all(filtro[posicion // 8] & (1 << (posicion % 8)) for posicion in _posiciones_bloom(valor, bloom['bits']))
+
+
+def filas_con_rangos(archivo):
+    """Recorrer un CSV binario devolviendo (fila, inicio, longitud) de cada registro"""
+    estado = {'posicion': 0}
+
+    def lineas():
+        for linea in archivo:
+            estado['posicion'] += len(linea)
+            yield linea.decode('utf-8')
+
+    inicio = 0
+    for fila in csv.reader(lineas()):
+        fin = estado['posicion']
+        if fila:
+            yield fila, inicio, fin - inicio
+        inicio = fin
+
+
+def valor_busqueda(columna, valor):
+    """Convertir un valor de búsqueda al tipo de la columna (ValueError si no es válido)"""
+    if valor is None:
+        return None
+    try:
+        return COLUMNAS_INDICE[columna](valor)
+    except ValueError:
+        raise ValueError(f"'{valor}' no es un valor válido para la columna {columna}.")
+
+
+def _convertir(columna, valor):
+    try:
+        return COLUMNAS_INDICE[columna](valor)
+    except ValueError:
+        return None
+
+
+def construir_indices(archivo):
+    """Construir el resumen y los índices por columna de un CSV de estudiantes (archivo binario)"""
+    filas = filas_con_rangos(archivo)
+    cabecera = next(filas)[0]
+    posiciones = {columna: cabecera.index(columna) for columna in COLUMNAS_INDICE}
+
+    valores = {columna: {} for columna in COLUMNAS_INDICE}
+    for fila, inicio, longitud in filas:
+        for columna, posicion in posiciones.items():
+            valor = _convertir(columna, fila[posicion]) if posicion < len(fila) else None
+            if valor is not None:
+                valores[columna].setdefault(valor, []).append([inicio, longitud])
+
+    resumen = {'cabecera': cabecera, 'columnas': {}}
+    indices = {}
+    for columna, rangos in valores.items():
+        ordenados = sorted(rangos)
+        indices[columna] = [[valor, rangos[valor]] for valor in ordenados]
+        resumen['columnas'][columna] = {
+            'minimo': ordenados[0] if ordenados else None,
+            'maximo': ordenados[-1] if ordenados else None,
+            'valores_distintos': len(ordenados),
+            'bloom': crear_bloom(ordenados),
+        }
+    return resumen, indices
+
+
+def subir_indices(archivo, nombre_bucket, key):
+    """Construir los índices de un CSV ya subido y guardarlos junto a él"""
+    resumen, indices = construir_indices(archivo)
+    # Las búsquedas piden los rangos contra esta versión del CSV
+    cabecera = ejecutar(clave_s3(nombre_bucket, key), obtener_cliente('s3').head_object, Bucket=nombre_bucket, Key=key)
+    resumen['etag'] = cabecera['ETag']
+
+    prefijo = prefijo_indices(key)
+    for columna, indice in indices.items():
+        subir_contenido(json.dumps(indice, ensure_ascii=False), [(nombre_bucket, f'{prefijo}{columna}.json')])
+    # El resumen se sube el último: si existe, los índices de columna también
+    subir_contenido(json.dumps(resumen, ensure_ascii=False), [(nombre_bucket, f'{prefijo}resumen.json')])
+    print(f'Índices de {key} guardados en {prefijo} ({", ".join(indices)}).')
+
+
+def _leer_json(nombre_bucket, key):
+    respuesta = ejecutar(clave_s3(nombre_bucket, key), obtener_cliente('s3').get_object, Bucket=nombre_bucket, Key=key)
+    return json.loads(respuesta['Body'].read())
+
+
+def _agrupar_rangos(rangos):
+    """Unir rangos cercanos: [(inicio, fin, [(inicio, longitud), ...])]"""
+    grupos = []
+    for inicio, longitud in sorted(rangos):
+        if grupos and inicio - grupos[-1][1] <= HUECO_MAXIMO_RANGOS:
+            grupos[-1][1] = max(grupos[-1][1], inicio + longitud)
+            grupos[-1][2].append((inicio, longitud))
+        else:
+            grupos.append([inicio, inicio + longitud, [(inicio, longitud)]])
+    return grupos
+
+
+class IndiceEstudiantes:
+    def __init__(self, nombre_bucket=None, key=None):
+        from almacenamiento_s3 import bucket_name, folder_name
+
+        self.bucket = nombre_bucket or bucket_name
+        self.key = key or f'{folder_name}csv/datos_practicas.csv'
+        self.prefijo = prefijo_indices(self.key)
+        self._resumen = None
+        self._indices = {}
+
+    @property
+    def resumen(self):
+        if self._resumen is None:
+            self._resumen = _leer_json(self.bucket, f'{self.prefijo}resumen.json')
+        return self._resumen
+
+    def indice(self, columna):
+        if columna not in self._indices:
+            self._indices[columna] = _leer_json(self.bucket, f'{self.prefijo}{columna}.json')
+        return self._indices[columna]
+
+    def rangos(self, columna, igual=None, desde=None, hasta=None, estricto=False):
+        """Rangos de bytes de las filas que cumplen la condición sobre la columna"""
+        if columna not in COLUMNAS_INDICE:
+            raise ValueError(f"La columna {columna} no está indexada. Columnas indexadas: {', '.join(COLUMNAS_INDICE)}")
+        # Validar los valores antes de pedir nada a S3
+        igual, desde, hasta = (valor_busqueda(columna, valor) for valor in (igual, desde, hasta))
+        resumen = self.resumen['columnas'][columna]
+        if resumen['minimo'] is None:
+            return []
+
+        if igual is not None:
+            if not resumen['minimo'] <= igual <= resumen['maximo'] or not puede_contener(resumen['bloom'], igual):
+                return []
+            desde = hasta = igual
+            estricto = False
+        else:
+            if (desde is not None and desde > resumen['maximo']) or (hasta is not None and hasta < resumen['minimo']):
+                return []
+
+        indice = self.indice(columna)
+        valores = [valor for valor, _ in indice]
+        if desde is None:
+            primero = 0
+        else:
+            primero = bisect.bisect_right(valores, desde) if estricto else bisect.bisect_left(valores, desde)
+        if hasta is None:
+            ultimo = len(valores)
+        else:
+            ultimo = bisect.bisect_left(valores, hasta) if estricto else bisect.bisect_right(valores, hasta)
+        return [rango for _, rangos in indice[primero:ultimo] for rango in rangos]
+
+    def leer_filas(self, rangos, max_workers=8):
+        """Pedir solo los rangos de bytes indicados del CSV y devolver las filas como dicts"""
+        s3_client = obtener_cliente('s3')
+        cabecera = self.resumen['cabecera']
+
+        def leer_grupo(grupo):
+            inicio, fin, filas = grupo
+            try:
+                respuesta = ejecutar(
+                    clave_s3(self.bucket, self.key), s3_client.get_object,
+                    Bucket=self.bucket, Key=self.key, Range=f'bytes={inicio}-{fin - 1}', IfMatch=self.resumen['etag'],
+                )
+            except Exception as e:
+                if precondicion_fallida(e):
+                    raise ValueError(f"Los índices de {self.key} no corresponden a la versión actual del CSV.")
+                raise
+            datos = respuesta['Body'].read()
+            registros = []
+            for desplazamiento, longitud in filas:
+                texto = datos[desplazamiento - inicio:desplazamiento - inicio + longitud].decode('utf-8')
+                registros.append(dict(zip(cabecera, next(csv.reader(io.StringIO(texto))))))
+            return registros
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return [fila for grupo in executor.map(leer_grupo, _agrupar_rangos(rangos)) for fila in grupo]
+
+    def buscar(self, columna, igual=None, desde=None, hasta=None, estricto=False):
+        """Filas del CSV con columna = igual, o entre desde y hasta (excluidos si estricto)"""
+        return self.leer_filas(self.rangos(columna, igual, desde, hasta, estricto))
+
+
+def keys_csv_estudiantes(nombre_bucket=None):
+    """CSV de la tabla de estudiantes: el de los datos generados y las partes de la ingesta continua"""
+    from almacenamiento_s3 import bucket_name, folder_name
+
+    bucket = nombre_bucket or bucket_name
+    prefijo = f'{folder_name}csv/'
+    s3_client = ClienteConRitmo(obtener_cliente('s3'), clave_s3(bucket, prefijo))
+    return [
+        obj['Key']
+        for pagina in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefijo)
+        for obj in pagina.get('Contents', [])
+        if obj['Key'].endswith('.csv')
+    ]
+
+
+def buscar_estudiantes(columna, igual=None, desde=None, hasta=None, estricto=False, nombre_bucket=None, max_workers=8):
+    """Buscar en todos los CSV de la tabla de estudiantes; falla si alguno no tiene índices"""
+    for valor in (igual, desde, hasta):
+        valor_busqueda(columna, valor)
+
+    def buscar(key):
+        indice = IndiceEstudiantes(nombre_bucket, key)
+        try:
+            indice.resumen
+        except Exception as e:
+            if no_existe(e):
+                raise ValueError(f"{key} no tiene índices secundarios: la búsqueda no cubriría sus filas.")
+            raise
+        return indice.buscar(columna, igual, desde, hasta, estricto)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [fila for filas in executor.map(buscar, keys_csv_estudiantes(nombre_bucket)) for fila in filas]
@@ -0,0 +1,296 @@
+import csv
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from archivos import escribir_json_atomico
+from clientes import obtener_cliente
+from control_ritmo import clave_s3, ejecutar
+from indices import subir_indices
+from lotes import ESQUEMA_ESTUDIANTES, MAX_INT32, MIN_INT32, LoteEstudiantes
+
+# --------------------------------
+# Ingesta continua: los registros nuevos (stdin, un archivo que crece o una
+# cola del proceso) se acumulan en memoria hasta un número de registros,
+# bytes o segundos y cada micro-lote se escribe como un objeto nuevo e
+# inmutable en la LOCATION de las tablas, que Athena ve sin recrearlas.
+#
+# Entrega al menos una vez: antes de subir, cada lote sellado se guarda en
+# ./.ingesta/pendientes con sus keys definitivas; tras subirlo se anota en
+# el diario y se borra. Al arrancar se suben los pendientes (con las mismas
+# keys, así que repetirlos no duplica datos) y la lectura de un archivo
+# continúa desde la última posición confirmada. Cada parte CSV lleva sus
+# índices secundarios, así que las búsquedas por índice también la cubren.
+# --------------------------------
+
+ingesta_folder = './.ingesta'
+
+MAX_REGISTROS_LOTE = 1000
+MAX_BYTES_LOTE = 8 * 1024 * 1024
+MAX_SEGUNDOS_LOTE = 5.0
+# Registros leídos que pueden esperar a ser subidos antes de frenar la lectura
+CAPACIDAD_COLA = 10000
+INTENTOS_SUBIDA = 5
+
+_FIN = object()
+
+
+def convertir_registro(linea, formato_entrada='json'):
+    """Convertir una línea de entrada (JSON o CSV sin cabecera) en una tupla del esquema"""
+    if formato_entrada == 'json':
+        datos = linea if isinstance(linea, dict) else json.loads(linea)
+        valores = [datos.get(columna) for columna in ESQUEMA_ESTUDIANTES]
+    elif formato_entrada == 'csv':
+        valores = next(csv.reader([linea]))
+    else:
+        raise ValueError(f"Formato de entrada no soportado: {formato_entrada}")
+    if len(valores) != len(ESQUEMA_ESTUDIANTES):
+        raise ValueError(f"Se esperaban {len(ESQUEMA_ESTUDIANTES)} campos y se recibieron {len(valores)}.")
+    registro = tuple(
+        int(valor) if codigo else ('' if valor is None else str(valor))
+        for valor, codigo in zip(valores, ESQUEMA_ESTUDIANTES.values())
+    )
+    # Las columnas enteras son int32: un valor fuera de rango se rechaza aquí
+    for columna, valor, codigo in zip(ESQUEMA_ESTUDIANTES, registro, ESQUEMA_ESTUDIANTES.values()):
+        if codigo and not MIN_INT32 <= valor <= MAX_INT32:
+            raise ValueError(f"{columna}={valor} está fuera del rango de int32.")
+    return registro
+
+
+# --------------------------------
+# Orígenes: generadores de (línea, posición confirmable o None)
+# --------------------------------
+
+def leer_stdin():
+    for linea in sys.stdin:
+        yield linea, None
+
+
+def leer_cola(cola):
+    """Leer de una queue.Queue del proceso hasta recibir None"""
+    while True:
+        elemento = cola.get()
+        if elemento is None:
+            return
+        yield elemento, None
+
+
+def seguir_archivo(ruta, posicion=0, espera=0.5, parar=None):
+    """Leer las líneas que se van añadiendo a un archivo (como tail -F)"""
+    while parar is None or not parar.is_set():
+        if not os.path.exists(ruta):
+            time.sleep(espera)
+            continue
+        if os.path.getsize(ruta) < posicion:
+            print(f"{ruta} se ha truncado o rotado; se lee desde el principio.")
+            posicion = 0
+        with open(ruta, 'rb') as file:
+            file.seek(posicion)
+            pendiente = b''
+            for linea in file:
+                if not linea.endswith(b'\n'):
+                    # Línea a medio escribir: se relee en la siguiente vuelta
+                    pendiente = linea
+                    break
+                posicion += len(linea)
+                yield linea.decode('utf-8'), posicion
+            if not pendiente:
+                time.sleep(espera)
+            else:
+                time.sleep(espera / 10)
+
+
+class DiarioIngesta:
+    def __init__(self, carpeta=ingesta_folder):
+        self.carpeta = carpeta
+        self.carpeta_pendientes = os.path.join(carpeta, 'pendientes')
+        self.ruta_diario = os.path.join(carpeta, 'diario.jsonl')
+        os.makedirs(self.carpeta_pendientes, exist_ok=True)
+
+    def posicion(self, origen):
+        """Última posición confirmada de un origen (0 si no hay ninguna)"""
+        posicion = 0
+        if os.path.exists(self.ruta_diario):
+            with open(self.ruta_diario, 'r', encoding='utf-8') as file:
+                for linea in file:
+                    entrada = json.loads(linea)
+                    if entrada['origen'] == origen and entrada['posicion'] is not None:
+                        posicion = entrada['posicion']
+        return posicion
+
+    def sellar(self, parte, datos):
+        """Guardar en disco un lote listo para subir (escritura atómica)"""
+        ruta = os.path.join(self.carpeta_pendientes, f'{parte}.json')
+        escribir_json_atomico(ruta, datos, sincronizar=True, ensure_ascii=False)
+
+    def confirmar(self, parte, datos):
+        """Anotar un lote subido en el diario y borrar su copia pendiente"""
+        entrada = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'parte': parte,
+            'origen': datos['origen'],
+            'posicion': datos['posicion'],
+            'registros': datos['registros'],
+            'keys': list(datos['objetos']),
+        }
+        with open(self.ruta_diario, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.remove(os.path.join(self.carpeta_pendientes, f'{parte}.json'))
+
+    def pendientes(self):
+        """Lotes sellados que no llegaron a confirmarse: [(parte, datos)]"""
+        lotes = []
+        for nombre in sorted(os.listdir(self.carpeta_pendientes)):
+            if nombre.endswith('.json'):
+                with open(os.path.join(self.carpeta_pendientes, nombre), 'r', encoding='utf-8') as file:
+                    lotes.append((nombre[:-len('.json')], json.load(file)))
+        return lotes
+
+
+class IngestaContinua:
+    def __init__(self, nombre_bucket=None, formatos=('csv', 'json'), max_registros=MAX_REGISTROS_LOTE,
+                 max_bytes=MAX_BYTES_LOTE, max_segundos=MAX_SEGUNDOS_LOTE, formato_entrada='json',
+                 capacidad=CAPACIDAD_COLA, diario=None):
+        from almacenamiento_s3 import bucket_name
+
+        self.bucket = nombre_bucket or bucket_name
+        self.formatos = tuple(formatos)
+        self.max_registros = max_registros
+        self.max_bytes = max_bytes
+        self.max_segundos = max_segundos
+        self.formato_entrada = formato_entrada
+        # Cola acotada entre la lectura y la subida: si S3 va más lento, la lectura se frena
+        self.cola = queue.Queue(maxsize=capacidad)
+        self.diario = diario or DiarioIngesta()
+        self.estadisticas = {'registros': 0, 'rechazados': 0, 'lotes': 0}
+
+    def _keys_parte(self, parte):
+        from almacenamiento_s3 import folder_name
+
+        return {formato: f'{folder_name}{formato}/{parte}.{formato}' for formato in self.formatos}
+
+    def _subir(self, parte, datos):
+        s3_client = obtener_cliente('s3')
+        for key, contenido in datos['objetos'].items():
+            for intento in range(INTENTOS_SUBIDA):
+                try:
+                    ejecutar(clave_s3(self.bucket, key), s3_client.put_object, Bucket=self.bucket, Key=key, Body=contenido.encode('utf-8'))
+                    break
+                except Exception as e:
+                    if intento == INTENTOS_SUBIDA - 1:
+                        raise
+                    print(f"Error al subir {key} ({e}); reintento {intento + 1} de {INTENTOS_SUBIDA - 1}")
+                    time.sleep(min(30, 2 ** intento))
+        for key, contenido in datos['objetos'].items():
+            if key.endswith('.csv'):
+                subir_indices(io.BytesIO(contenido.encode('utf-8')), self.bucket, key)
+        self.diario.confirmar(parte, datos)
+        self.estadisticas['lotes'] += 1
+        print(f"Lote {parte} subido: {datos['registros']} registros en {', '.join(datos['objetos'])}")
+
+    def recuperar_pendientes(self):
+        """Subir los lotes que quedaron sellados sin confirmar en una ejecución anterior"""
+        for parte, datos in self.diario.pendientes():
+            print(f"Recuperando el lote pendiente {parte}")
+            self._subir(parte, datos)
+
+    def _volcar(self, lote, origen, posicion):
+        """Sellar y subir un micro-lote como objetos nuevos"""
+        from almacenamiento_s3 import serializar_lote
+
+        if not len(lote):
+            return
+        parte = f"parte-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        contenidos = serializar_lote(lote, self.formatos)
+        keys = self._keys_parte(parte)
+        datos = {
+            'origen': origen,
+            'posicion': posicion,
+            'registros': len(lote),
+            'objetos': {keys[formato]: contenido for formato, contenido in contenidos.items()},
+        }
+        self.diario.sellar(parte, datos)
+        self._subir(parte, datos)
+
+    def _leer(self, lineas):
+        """Hilo de lectura: pasa las líneas a la cola acotada (bloquea si está llena)"""
+        try:
+            for linea, posicion in lineas:
+                self.cola.put((linea, posicion))
+        finally:
+            self.cola.put(_FIN)
+
+    def ejecutar(self, lineas, origen='stdin'):
+        """Consumir un origen de líneas, subiendo un micro-lote cada vez que se llena o caduca"""
+        self.recuperar_pendientes()
+        lector = threading.Thread(target=self._leer, args=(lineas,), daemon=True)
+        lector.start()
+
+        lote, tamano, posicion, inicio = LoteEstudiantes(), 0, None, None
+        try:
+            while True:
+                espera = None if inicio is None else max(0.0, inicio + self.max_segundos - time.monotonic())
+                try:
+                    elemento = self.cola.get(timeout=espera)
+                except queue.Empty:
+                    elemento = None
+                if elemento is _FIN:
+                    break
+                if elemento is not None:
+                    linea, posicion_linea = elemento
+                    if isinstance(linea, str) and not linea.strip():
+                        posicion = posicion_linea if posicion_linea is not None else posicion
+                        continue
+                    try:
+                        lote.agregar(*convertir_registro(linea, self.formato_entrada))
+                        self.estadisticas['registros'] += 1
+                    except (ValueError, TypeError, OverflowError) as e:
+                        self.estadisticas['rechazados'] += 1
+                        print(f"Registro rechazado ({e}): {str(linea).strip()[:200]}")
+                    # Bytes, no caracteres: MAX_BYTES_LOTE es un tamaño de objeto
+                    tamano += len((linea if isinstance(linea, str) else json.dumps(linea)).encode('utf-8'))
+                    if posicion_linea is not None:
+                        posicion = posicion_linea
+                    if inicio is None:
+                        inicio = time.monotonic()
+
+                caducado = inicio is not None and time.monotonic() - inicio >= self.max_segundos
+                if len(lote) >= self.max_registros or tamano >= self.max_bytes or caducado:
+                    self._volcar(lote, origen, posicion)
+                    lote, tamano, inicio = LoteEstudiantes(), 0, None
+        except KeyboardInterrupt:
+            print("\nIngesta interrumpida; se sube el último lote.")
+        self._volcar(lote, origen, posicion)
+        print(
+            f"Ingesta terminada: {self.estadisticas['registros']} registros en {self.estadisticas['lotes']} lotes, "
+            f"{self.estadisticas['rechazados']} rechazados"
+        )
+        return self.estadisticas
+
+
+def ingerir_archivo(ruta, **kwargs):
+    """Seguir un archivo JSONL o CSV que crece, continuando desde la última posición confirmada"""
+    ingesta = IngestaContinua(**kwargs)
+    origen = f'archivo:{os.path.abspath(ruta)}'
+    # Primero los lotes pendientes: al confirmarlos avanza la posición desde
+    # la que se sigue leyendo y sus líneas no se vuelven a leer
+    ingesta.recuperar_pendientes()
+    return ingesta.ejecutar(seguir_archivo(ruta, ingesta.diario.posicion(origen)), origen)
+
+
+def ingerir_stdin(**kwargs):
+    """Ingerir los registros que llegan por la entrada estándar hasta su cierre"""
+    return IngestaContinua(**kwargs).ejecutar(leer_stdin(), 'stdin')
+
+
+def ingerir_cola(cola, **kwargs):
+    """Ingerir los registros (dicts o líneas) que otros hilos ponen en una cola; None la cierra"""
+    return IngestaContinua(**kwargs).ejecutar(leer_cola(cola), 'cola')
@@ -0,0 +1,293 @@
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# --------------------------------
+# Métricas por operación AWS registradas en el sistema de eventos de la
+# sesión boto3 compartida: llamadas, latencias, bytes, reintentos,
+# throttling, estadísticas de Athena y esperas (waiters y polling).
+# --------------------------------
+
+# Límites (segundos) de las cubetas del histograma de latencia
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CODIGOS_THROTTLING = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException',
+    'TransactionInProgressException', 'RequestLimitExceeded', 'BandwidthLimitExceeded',
+    'LimitExceededException', 'RequestThrottled', 'SlowDown', 'PriorRequestNotComplete',
+    'EC2ThrottledException',
+}
+
+ESTADOS_FINALES_ATHENA = ('SUCCEEDED', 'FAILED', 'CANCELLED')
+
+_instrumentacion = None
+
+
+def _nombre_operacion(event_name):
+    """'after-call.s3.PutObject' -> ('s3', 'PutObject')"""
+    partes = event_name.split('.')
+    return partes[1], partes[2]
+
+
+def _longitud_contenido(headers):
+    try:
+        return int(headers.get('content-length') or headers.get('Content-Length') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Instrumentacion:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.operaciones = {}
+        self.consultas_athena = {}
+        self.esperas = {}
+
+    def _operacion(self, servicio, operacion):
+        clave = (servicio, operacion)
+        datos = self.operaciones.get(clave)
+        if datos is None:
+            datos = self.operaciones[clave] = {
+                'llamadas': 0,
+                'intentos': 0,
+                'errores': 0,
+                'throttles': 0,
+                'bytes_enviados': 0,
+                'bytes_recibidos': 0,
+                'latencia_total': 0.0,
+                'cubetas': [0] * (len(LIMITES_LATENCIA) + 1),
+            }
+        return datos
+
+    # Manejadores de eventos de botocore
+
+    def registrar(self, eventos):
+        """Registrar los manejadores en un emisor de eventos (de la sesión o de un cliente)"""
+        eventos.register('before-call', self._antes_llamada, unique_id='instrumentacion-antes')
+        eventos.register('before-send', self._antes_envio, unique_id='instrumentacion-envio')
+        eventos.register('response-received', self._respuesta, unique_id='instrumentacion-respuesta')
+        eventos.register('after-call', self._despues_llamada, unique_id='instrumentacion-despues')
+        eventos.register('after-call-error', self._error_llamada, unique_id='instrumentacion-error')
+
+    def _antes_llamada(self, context=None, **kwargs):
+        if context is not None:
+            context['instrumentacion_inicio'] = time.perf_counter()
+
+    def _antes_envio(self, request, event_name, **kwargs):
+        enviados = _longitud_contenido(request.headers)
+        if not enviados and isinstance(request.body, (bytes, bytearray)):
+            enviados = len(request.body)
+        servicio, operacion = _nombre_operacion(event_name)
+        with self._lock:
+            self._operacion(servicio, operacion)['bytes_enviados'] += enviados
+
+    def _respuesta(self, event_name, response_dict=None, parsed_response=None, **kwargs):
+        # Se emite una vez por intento, incluidos los reintentos
+        servicio, operacion = _nombre_operacion(event_name)
+        recibidos = _longitud_contenido((response_dict or {}).get('headers', {}))
+        codigo = (parsed_response or {}).get('Error', {}).get('Code')
+        with self._lock:
+            datos = self._operacion(servicio, operacion)
+            datos['intentos'] += 1
+            datos['bytes_recibidos'] += recibidos
+            if codigo in CODIGOS_THROTTLING:
+                datos['throttles'] += 1
+
+    def _fin_llamada(self, event_name, context, error):
+        inicio = (context or {}).get('instrumentacion_inicio')
+        latencia = time.perf_counter() - inicio if inicio else 0.0
+        servicio, operacion = _nombre_operacion(event_name)
+        with self._lock:
+            datos = self._operacion(servicio, operacion)
+            datos['llamadas'] += 1
+            datos['errores'] += 1 if error else 0
+            datos['latencia_total'] += latencia
+            datos['cubetas'][bisect.bisect_left(LIMITES_LATENCIA, latencia)] += 1
+
+    def _despues_llamada(self, event_name, http_response=None, parsed=None, context=None, **kwargs):
+        # after-call también se emite para respuestas de error del servicio
+        error = bool(parsed and 'Error' in parsed) or (
+            http_response is not None and http_response.status_code >= 300
+        )
+        self._fin_llamada(event_name, context, error=error)
+        if event_name.endswith('.GetQueryExecution') and parsed:
+            self._registrar_athena(parsed.get('QueryExecution', {}))
+
+    def _error_llamada(self, event_name, context=None, **kwargs):
+        self._fin_llamada(event_name, context, error=True)
+
+    def _registrar_athena(self, execution):
+        if execution.get('Status', {}).get('State') not in ESTADOS_FINALES_ATHENA:
+            return
+        estadisticas = execution.get('Statistics', {})
+        with self._lock:
+            self.consultas_athena[execution['QueryExecutionId']] = {
+                'estado': execution['Status']['State'],
+                'bytes_escaneados': estadisticas.get('DataScannedInBytes', 0),
+                'cola_ms': estadisticas.get('QueryQueueTimeInMillis', 0),
+                'preprocesado_ms': estadisticas.get('ServicePreProcessingTimeInMillis', 0),
+                'motor_ms': estadisticas.get('EngineExecutionTimeInMillis', 0),
+                'total_ms': estadisticas.get('TotalExecutionTimeInMillis', 0),
+            }
+
+    def registrar_espera(self, nombre, segundos):
+        with self._lock:
+            datos = self.esperas.setdefault(nombre, {'esperas': 0, 'segundos': 0.0})
+            datos['esperas'] += 1
+            datos['segundos'] += segundos
+
+    # Exportación
+
+    def resumen(self):
+        """Resumen de la ejecución en un diccionario serializable a JSON"""
+        with self._lock:
+            operaciones = {}
+            for (servicio, operacion), datos in sorted(self.operaciones.items()):
+                llamadas = datos['llamadas']
+                operaciones[f'{servicio}.{operacion}'] = {
+                    'llamadas': llamadas,
+                    'reintentos': max(0, datos['intentos'] - llamadas),
+                    'errores': datos['errores'],
+                    'throttles': datos['throttles'],
+                    'bytes_enviados': datos['bytes_enviados'],
+                    'bytes_recibidos': datos['bytes_recibidos'],
+                    'latencia_media_s': round(datos['latencia_total'] / llamadas, 4) if llamadas else 0,
+                    'latencia_p50_s': self._percentil(datos['cubetas'], 0.5),
+                    'latencia_p99_s': self._percentil(datos['cubetas'], 0.99),
+                }
+            consultas = list(self.consultas_athena.values())
+            return {
+                'inicio': datetime.fromtimestamp(self.inicio).isoformat(timespec='seconds'),
+                'duracion_s': round(time.time() - self.inicio, 3),
+                'operaciones': operaciones,
+                'athena': {
+                    'consultas': len(consultas),
+                    'bytes_escaneados': sum(c['bytes_escaneados'] for c in consultas),
+                    'cola_ms': sum(c['cola_ms'] for c in consultas),
+                    'motor_ms': sum(c['motor_ms'] for c in consultas),
+                },
+                'esperas': {nombre: dict(datos) for nombre, datos in self.esperas.items()},
+            }
+
+    def _percentil(self, cubetas, fraccion):
+        """Límite superior de la cubeta que contiene el percentil (None si cae en +Inf)"""
+        total = sum(cubetas)
+        if not total:
+            return 0
+        acumulado = 0
+        for indice, cantidad in enumerate(cubetas):
+            acumulado += cantidad
+            if acumulado >= total * fraccion:
+                return LIMITES_LATENCIA[indice] if indice < len(LIMITES_LATENCIA) else None
+
+    def texto_prometheus(self):
+        """Métricas en formato de texto de Prometheus"""
+        lineas = []
+        with self._lock:
+            operaciones = sorted(self.operaciones.items())
+            contadores = [
+                ('aws_llamadas_total', 'llamadas'),
+                ('aws_intentos_total', 'intentos'),
+                ('aws_errores_total', 'errores'),
+                ('aws_throttles_total', 'throttles'),
+                ('aws_bytes_enviados_total', 'bytes_enviados'),
+                ('aws_bytes_recibidos_total', 'bytes_recibidos'),
+            ]
+            for metrica, campo in contadores:
+                lineas.append(f'# TYPE {metrica} counter')
+                for (servicio, operacion), datos in operaciones:
+                    lineas.append(f'{metrica}{{servicio="{servicio}",operacion="{operacion}"}} {datos[campo]}')
+
+            lineas.append('# TYPE aws_latencia_segundos histogram')
+            for (servicio, operacion), datos in operaciones:
+                etiquetas = f'servicio="{servicio}",operacion="{operacion}"'
+                acumulado = 0
+                for limite, cantidad in zip(LIMITES_LATENCIA + ('+Inf',), datos['cubetas']):
+                    acumulado += cantidad
+                    lineas.append(f'aws_latencia_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                lineas.append(f'aws_latencia_segundos_sum{{{etiquetas}}} {datos["latencia_total"]:.6f}')
+                lineas.append(f'aws_latencia_segundos_count{{{etiquetas}}} {datos["llamadas"]}')
+
+            consultas = list(self.consultas_athena.values())
+            for metrica, campo, escala in [
+                ('athena_bytes_escaneados_total', 'bytes_escaneados', 1),
+                ('athena_cola_segundos_total', 'cola_ms', 1000),
+                ('athena_motor_segundos_total', 'motor_ms', 1000),
+            ]:
+                lineas.append(f'# TYPE {metrica} counter')
+                lineas.append(f'{metrica} {sum(c[campo] for c in consultas) / escala:g}')
+
+            lineas.append('# TYPE espera_segundos_total counter')
+            for nombre, datos in sorted(self.esperas.items()):
+                lineas.append(f'espera_segundos_total{{nombre="{nombre}"}} {datos["segundos"]:.3f}')
+        return '\n'.join(lineas) + '\n'
+
+    def exportar(self, carpeta):
+        """Escribir metricas.prom y un resumen JSON de la ejecución en la carpeta"""
+        if not os.path.exists(carpeta):
+            os.makedirs(carpeta)
+        with open(os.path.join(carpeta, 'metricas.prom'), 'w', encoding='utf-8') as file:
+            file.write(self.texto_prometheus())
+        nombre = f"resumen_{datetime.fromtimestamp(self.inicio).strftime('%Y%m%d_%H%M%S')}.json"
+        with open(os.path.join(carpeta, nombre), 'w', encoding='utf-8') as file:
+            json.dump(self.resumen(), file, indent=2)
+        print(f'Métricas exportadas en {carpeta}')
+
+    def servir_prometheus(self, puerto=9108):
+        """Servir /metrics en un hilo en segundo plano"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        instrumentacion = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cuerpo = instrumentacion.texto_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer(('0.0.0.0', puerto), Manejador)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        print(f'Métricas Prometheus en http://0.0.0.0:{puerto}/metrics')
+        return servidor
+
+
+def activar():
+    """Activar la instrumentación en la sesión compartida (y en los clientes ya creados)"""
+    global _instrumentacion
+    if _instrumentacion is None:
+        from clientes import clientes_creados, obtener_sesion
+
+        _instrumentacion = Instrumentacion()
+        _instrumentacion.registrar(obtener_sesion().events)
+        # Los clientes copian los eventos de la sesión al crearse
+        for cliente in clientes_creados():
+            _instrumentacion.registrar(cliente.meta.events)
+    return _instrumentacion
+
+
+def obtener_instrumentacion():
+    """Instrumentación activa, o None si no se ha activado"""
+    return _instrumentacion
+
+
+@contextlib.contextmanager
+def medir_espera(nombre):
+    """Medir la duración de una espera (waiter o polling) si la instrumentación está activa"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _instrumentacion is not None:
+            _instrumentacion.registrar_espera(nombre, time.perf_counter() - inicio)
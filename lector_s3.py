@@ -0,0 +1,209 @@
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from clientes import obtener_cliente
+from control_ritmo import clave_s3, ejecutar
+
+# --------------------------------
+# Lectura de objetos grandes de S3 como un archivo con seek: el objeto se
+# divide en bloques que se piden con GET por rangos en paralelo por delante
+# de la posición de lectura. Como mucho hay max_bloques en memoria (pedidos,
+# listos o descartados que aún se están descargando) y los bloques ya leídos
+# se liberan. Las lecturas devuelven memoryviews sobre los bloques
+# descargados, sin copias intermedias.
+# --------------------------------
+
+TAMANO_BLOQUE = 8 * 1024 * 1024
+MAX_BLOQUES = 8
+
+
+class LectorS3(io.RawIOBase):
+    def __init__(self, bucket, key, tamano_bloque=TAMANO_BLOQUE, max_bloques=MAX_BLOQUES, max_workers=None):
+        if tamano_bloque <= 0 or max_bloques <= 0:
+            raise ValueError("El tamaño de bloque y el número de bloques deben ser positivos.")
+        self.bucket = bucket
+        self.key = key
+        self.tamano_bloque = tamano_bloque
+        self.max_bloques = max_bloques
+        self._s3 = obtener_cliente('s3')
+        self._clave_ritmo = clave_s3(bucket, key)
+
+        cabecera = ejecutar(self._clave_ritmo, self._s3.head_object, Bucket=bucket, Key=key)
+        self.tamano = cabecera['ContentLength']
+        # Todos los rangos se piden contra la misma versión del objeto
+        self.etag = cabecera['ETag']
+
+        self.posicion = 0
+        self._bloques = OrderedDict()
+        # Descargas descartadas que ya estaban en curso y aún ocupan memoria
+        self._descartados = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or max_bloques)
+
+    # Descarga de bloques
+
+    def _descargar_bloque(self, indice):
+        inicio = indice * self.tamano_bloque
+        fin = min(inicio + self.tamano_bloque, self.tamano) - 1
+        respuesta = ejecutar(
+            self._clave_ritmo, self._s3.get_object,
+            Bucket=self.bucket, Key=self.key, Range=f'bytes={inicio}-{fin}', IfMatch=self.etag,
+        )
+        return respuesta['Body'].read()
+
+    def _descartar(self, futuro):
+        """Cancelar la descarga de un bloque; si ya está en curso, anotarla hasta que termine"""
+        if not futuro.cancel():
+            self._descartados.add(futuro)
+
+    def _hueco(self):
+        """Bloques que aún se pueden pedir: los pedidos, los listos y los descartados en curso cuentan"""
+        self._descartados = {futuro for futuro in self._descartados if not futuro.done()}
+        return self.max_bloques - len(self._bloques) - len(self._descartados)
+
+    def _bloque(self, indice):
+        """Bytes de un bloque, pidiendo por adelantado los siguientes"""
+        ultimo = (self.tamano - 1) // self.tamano_bloque
+        while True:
+            with self._lock:
+                # Liberar los bloques que quedan por detrás de la lectura
+                for anterior in [i for i in self._bloques if i < indice]:
+                    self._descartar(self._bloques.pop(anterior))
+                for siguiente in range(indice, min(indice + self.max_bloques, ultimo + 1)):
+                    if siguiente in self._bloques:
+                        continue
+                    if self._hueco() <= 0 and self._bloques:
+                        # Tras un seek hacia delante: descartar los bloques más lejanos
+                        lejano = max(self._bloques)
+                        if lejano > siguiente:
+                            self._descartar(self._bloques.pop(lejano))
+                    if self._hueco() <= 0:
+                        break
+                    self._bloques[siguiente] = self._executor.submit(self._descargar_bloque, siguiente)
+                futuro = self._bloques.get(indice)
+                en_curso = list(self._descartados)
+            if futuro is not None:
+                return futuro.result()
+            # Ni siquiera hay hueco para el bloque pedido: esperar a que
+            # termine alguna descarga descartada que no se pudo cancelar
+            wait(en_curso, return_when=FIRST_COMPLETED)
+
+    def vista(self, n=-1):
+        """Leer hasta n bytes sin copiarlos (como mucho hasta el final del bloque actual)"""
+        self._comprobar_abierto()
+        if self.posicion >= self.tamano or n == 0:
+            return memoryview(b'')
+        indice, desplazamiento = divmod(self.posicion, self.tamano_bloque)
+        datos = memoryview(self._bloque(indice))[desplazamiento:]
+        if 0 < n < len(datos):
+            datos = datos[:n]
+        self.posicion += len(datos)
+        return datos
+
+    # Interfaz de archivo
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.posicion
+
+    def seek(self, desplazamiento, origen=io.SEEK_SET):
+        self._comprobar_abierto()
+        if origen == io.SEEK_SET:
+            posicion = desplazamiento
+        elif origen == io.SEEK_CUR:
+            posicion = self.posicion + desplazamiento
+        elif origen == io.SEEK_END:
+            posicion = self.tamano + desplazamiento
+        else:
+            raise ValueError(f"Origen de seek no válido: {origen}")
+        if posicion < 0:
+            raise ValueError("No se puede situar la lectura antes del inicio del objeto.")
+        self.posicion = posicion
+        return self.posicion
+
+    def readinto(self, buffer):
+        destino = memoryview(buffer).cast('B')
+        escritos = 0
+        while escritos < len(destino):
+            datos = self.vista(len(destino) - escritos)
+            if not datos:
+                break
+            destino[escritos:escritos + len(datos)] = datos
+            escritos += len(datos)
+        return escritos
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = max(0, self.tamano - self.posicion)
+        partes = []
+        while n > 0:
+            datos = self.vista(n)
+            if not datos:
+                break
+            partes.append(datos)
+            n -= len(datos)
+        if len(partes) == 1:
+            return partes[0].tobytes()
+        return b''.join(partes)
+
+    def read1(self, n=-1):
+        """Una única lectura, limitada al bloque actual (la usa io.TextIOWrapper)"""
+        return self.vista(n).tobytes()
+
+    def readall(self):
+        return self.read()
+
+    def readline(self, limite=-1):
+        self._comprobar_abierto()
+        partes = []
+        while limite != 0 and self.posicion < self.tamano:
+            indice, desplazamiento = divmod(self.posicion, self.tamano_bloque)
+            bloque = self._bloque(indice)
+            fin = len(bloque) if limite < 0 else min(len(bloque), desplazamiento + limite)
+            salto = bloque.find(b'\n', desplazamiento, fin)
+            corte = fin if salto < 0 else salto + 1
+            partes.append(memoryview(bloque)[desplazamiento:corte])
+            self.posicion += corte - desplazamiento
+            if limite > 0:
+                limite -= corte - desplazamiento
+            if salto >= 0:
+                break
+        return b''.join(partes)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        linea = self.readline()
+        if not linea:
+            raise StopIteration
+        return linea
+
+    def close(self):
+        if not self.closed:
+            with self._lock:
+                for futuro in self._bloques.values():
+                    futuro.cancel()
+                self._bloques.clear()
+                self._descartados.clear()
+            self._executor.shutdown(wait=False)
+        super().close()
+
+    def _comprobar_abierto(self):
+        if self.closed:
+            raise ValueError("El lector de S3 está cerrado.")
+
+
+def abrir_objeto_s3(bucket, key, texto=False, **kwargs):
+    """Abrir un objeto de S3 para leerlo en streaming (binario o texto UTF-8)"""
+    lector = LectorS3(bucket, key, **kwargs)
+    if texto:
+        return io.TextIOWrapper(lector, encoding='utf-8', newline='')
+    return lector
@@ -0,0 +1,145 @@
+import csv
+import json
+from array import array
+
+# --------------------------------
+# Lotes columnares de estudiantes: un array por columna en lugar de una
+# tupla o un dict por fila. Una sola pasada de Faker llena el lote y el
+# escritor lo serializa a la vez en CSV, JSONL y Parquet.
+# --------------------------------
+
+# Esquema de la tabla de estudiantes: columna -> código de array o None (lista de str)
+ESQUEMA_ESTUDIANTES = {
+    'id_estudiante': 'i',
+    'dni': 'i',
+    'nombre_completo': None,
+    'fecha_nacimiento': None,
+    'email': None,
+    'telefono': None,
+    'direccion': None,
+    'nacionalidad': None,
+    'id_centro': 'i',
+    'titulacion': None,
+    'curso_academico': None,
+}
+
+# Rango de las columnas enteras (array 'i' y int32 en Parquet)
+MIN_INT32, MAX_INT32 = -2 ** 31, 2 ** 31 - 1
+
+FORMATOS = ('csv', 'json', 'parquet')
+
+
+class LoteEstudiantes:
+    __slots__ = ('columnas',)
+
+    def __init__(self):
+        self.columnas = {
+            nombre: array(codigo) if codigo else []
+            for nombre, codigo in ESQUEMA_ESTUDIANTES.items()
+        }
+
+    def __len__(self):
+        return len(self.columnas['id_estudiante'])
+
+    def agregar(self, *valores):
+        """Añadir una fila con los valores en el orden del esquema"""
+        if len(valores) != len(self.columnas):
+            raise ValueError(f"Se esperaban {len(self.columnas)} valores y se recibieron {len(valores)}.")
+        # Si un valor no cabe en su columna (tipo o rango de int32) se deshacen
+        # los valores ya añadidos para que las columnas sigan alineadas
+        anadidas = []
+        try:
+            for columna, valor in zip(self.columnas.values(), valores):
+                columna.append(valor)
+                anadidas.append(columna)
+        except Exception:
+            for columna in anadidas:
+                columna.pop()
+            raise
+
+    def filas(self):
+        """Recorrer las filas como tuplas, sin materializarlas todas"""
+        return zip(*self.columnas.values())
+
+    @classmethod
+    def generar(cls, num_registros=100, semilla=None):
+        """Generar registros sintéticos de estudiantes en una sola pasada de Faker"""
+        import faker
+
+        fake = faker.Faker('es_ES')
+        if semilla is not None:
+            fake.seed_instance(semilla)
+
+        lote = cls()
+        agregar = lote.agregar
+        for _ in range(num_registros):
+            agregar(
+                fake.random_int(min=1, max=1000),
+                fake.random_int(min=10000000, max=99999999),
+                fake.name(),
+                str(fake.date_of_birth(minimum_age=18, maximum_age=30)),
+                fake.email(),
+                fake.phone_number(),
+                fake.address().replace('\n', ', '),
+                fake.country(),
+                fake.random_int(min=1, max=50),
+                fake.word().capitalize(),
+                f"{fake.random_int(min=2018, max=2023)}-{fake.random_int(min=2019, max=2024)}",
+            )
+        return lote
+
+    def tabla_arrow(self):
+        """Tabla de pyarrow construida directamente desde las columnas"""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError("Para escribir Parquet es necesario instalar pyarrow (pip install -r requirements-parquet.txt).")
+        return pa.table({
+            nombre: pa.array(valores, type=pa.int32() if ESQUEMA_ESTUDIANTES[nombre] else pa.string())
+            for nombre, valores in self.columnas.items()
+        })
+
+
+def escribir_lote(lote, salidas):
+    """Escribir un lote en varios formatos a la vez.
+
+    salidas: formato ('csv', 'json', 'parquet') -> archivo abierto (texto
+    para CSV y JSONL, binario para Parquet) o ruta. CSV y JSONL se escriben
+    en una única pasada por las filas; Parquet se escribe por columnas.
+    """
+    desconocidos = set(salidas) - set(FORMATOS)
+    if desconocidos:
+        raise ValueError(f"Formatos no soportados: {', '.join(sorted(desconocidos))}")
+
+    if 'parquet' in salidas:
+        tabla = lote.tabla_arrow()
+        import pyarrow.parquet as pq
+
+        pq.write_table(tabla, salidas['parquet'], compression='snappy')
+
+    abiertos = []
+    try:
+        archivos = {}
+        for formato in ('csv', 'json'):
+            if formato in salidas:
+                salida = salidas[formato]
+                if isinstance(salida, str):
+                    salida = open(salida, 'w', encoding='utf-8', newline='')
+                    abiertos.append(salida)
+                archivos[formato] = salida
+        if not archivos:
+            return
+
+        escritor_csv = csv.writer(archivos['csv']) if 'csv' in archivos else None
+        archivo_json = archivos.get('json')
+        if escritor_csv:
+            escritor_csv.writerow(ESQUEMA_ESTUDIANTES)
+        nombres = list(ESQUEMA_ESTUDIANTES)
+        for fila in lote.filas():
+            if escritor_csv:
+                escritor_csv.writerow(fila)
+            if archivo_json:
+                archivo_json.write(json.dumps(dict(zip(nombres, fila))) + '\n')
+    finally:
+        for archivo in abiertos:
+            archivo.close()
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import re
+import statistics
+import threading
+from collections import deque
+from datetime import datetime
+
+from consultas_locales import MINIMO_FACTURADO_ATHENA, PRECIO_ATHENA_POR_TB
+
+# --------------------------------
+# Perfil de consultas de Athena: cada consulta terminada se guarda en un
+# historial local (JSONL) con su bloque Statistics, agrupada por la huella
+# de su SQL normalizado. Al registrar se compara con las ejecuciones
+# anteriores de la misma huella para detectar regresiones (más bytes
+# escaneados o más tiempo de motor tras un cambio de formato o particiones).
+# Solo se perfilan las consultas (SELECT/WITH), no el DDL. Las referencias
+# de cada huella se mantienen en memoria y del historial solo se lee lo que
+# se ha añadido desde la última vez.
+# --------------------------------
+
+historial_file = './.historial_athena.jsonl'
+
+# Ejecuciones previas con las que se calcula la referencia de una huella
+VENTANA_REFERENCIA = 10
+# Factor sobre la mediana de referencia a partir del cual hay regresión
+FACTORES_REGRESION = {
+    'bytes_escaneados': 2.0,
+    'motor_ms': 3.0,
+    'cola_ms': 5.0,
+}
+# Diferencias absolutas por debajo de las cuales no se avisa (ruido)
+DIFERENCIA_MINIMA = {
+    'bytes_escaneados': 10 * 1024 * 1024,
+    'motor_ms': 1000,
+    'cola_ms': 2000,
+}
+
+# Instrucciones que se perfilan; CREATE, DROP, ALTER... no tienen una referencia útil
+INSTRUCCIONES_PERFILADAS = ('select', 'with')
+
+_lock_historial = threading.Lock()
+# Últimas ejecuciones correctas por (huella, motor) y hasta dónde se ha leído el historial
+_referencias = {'ruta': None, 'posicion': 0, 'ejecuciones': {}}
+
+
+def normalizar_sql(query):
+    """SQL sin comentarios, literales ni diferencias de espacios o mayúsculas"""
+    sql = re.sub(r'--[^\n]*|/\*.*?\*/', ' ', query, flags=re.DOTALL)
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'(?<![\w.])\d+(?:\.\d+)?(?![\w.])', '?', sql)
+    sql = re.sub(r'\s+', ' ', sql).strip().rstrip(';').strip()
+    return sql.lower()
+
+
+def huella_sql(query):
+    """Huella corta del SQL normalizado: misma consulta con otros literales, misma huella"""
+    return hashlib.sha256(normalizar_sql(query).encode('utf-8')).hexdigest()[:16]
+
+
+def coste_escaneo(bytes_escaneados):
+    """Coste en USD de Athena por los bytes escaneados (con el mínimo facturado)"""
+    if not bytes_escaneados:
+        return 0.0
+    return max(bytes_escaneados, MINIMO_FACTURADO_ATHENA) / 1024 ** 4 * PRECIO_ATHENA_POR_TB
+
+
+def leer_historial(huella=None):
+    """Entradas del historial, opcionalmente de una sola huella"""
+    if not os.path.exists(historial_file):
+        return []
+    entradas = []
+    with open(historial_file, 'r', encoding='utf-8') as file:
+        for linea in file:
+            if linea.strip():
+                entrada = json.loads(linea)
+                if huella is None or entrada['huella'] == huella:
+                    entradas.append(entrada)
+    return entradas
+
+
+def es_consulta(query):
+    """Indicar si el SQL es una consulta (SELECT o WITH) y no DDL"""
+    palabras = normalizar_sql(query).lstrip('(').split(None, 1)
+    return bool(palabras) and palabras[0] in INSTRUCCIONES_PERFILADAS
+
+
+def _actualizar_referencias():
+    """Incorporar a las referencias en memoria las líneas nuevas del historial (con el lock tomado)"""
+    if _referencias['ruta'] != historial_file or not os.path.exists(historial_file) \
+            or os.path.getsize(historial_file) < _referencias['posicion']:
+        # Otro historial, o se ha borrado o truncado: empezar de cero
+        _referencias.update(ruta=historial_file, posicion=0, ejecuciones={})
+    if not os.path.exists(historial_file):
+        return
+    with open(historial_file, 'rb') as file:
+        file.seek(_referencias['posicion'])
+        for linea in file:
+            if not linea.endswith(b'\n'):
+                break
+            _referencias['posicion'] += len(linea)
+            if linea.strip():
+                _anotar_referencia(json.loads(linea))
+
+
+def _anotar_referencia(entrada):
+    if entrada['estado'] == 'SUCCEEDED':
+        clave = (entrada['huella'], entrada['motor'])
+        ejecuciones = _referencias['ejecuciones'].setdefault(clave, deque(maxlen=VENTANA_REFERENCIA))
+        ejecuciones.append({metrica: entrada[metrica] for metrica in ('estado', *FACTORES_REGRESION)})
+
+
+def detectar_regresiones(entrada, anteriores):
+    """Métricas de una ejecución muy por encima de la mediana de las anteriores"""
+    referencia = [e for e in anteriores if e['estado'] == 'SUCCEEDED'][-VENTANA_REFERENCIA:]
+    if not referencia or entrada['estado'] != 'SUCCEEDED':
+        return []
+    regresiones = []
+    for metrica, factor in FACTORES_REGRESION.items():
+        mediana = statistics.median(e[metrica] for e in referencia)
+        valor = entrada[metrica]
+        if valor > mediana * factor and valor - mediana >= DIFERENCIA_MINIMA[metrica]:
+            regresiones.append({
+                'metrica': metrica,
+                'valor': valor,
+                'referencia': mediana,
+                'factor': valor / mediana if mediana else None,
+            })
+    return regresiones
+
+
+def registrar_consulta(query_execution, descripcion='consulta'):
+    """Guardar las estadísticas de una consulta terminada y avisar si hay regresión (None si es DDL)"""
+    estadisticas = query_execution.get('Statistics', {})
+    query = query_execution.get('Query', '')
+    if not es_consulta(query):
+        return None
+    entrada = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'huella': huella_sql(query),
+        'descripcion': descripcion,
+        'sql': normalizar_sql(query),
+        'motor': query_execution.get('Motor', 'athena'),
+        'query_execution_id': query_execution.get('QueryExecutionId'),
+        'estado': query_execution.get('Status', {}).get('State'),
+        'bytes_escaneados': estadisticas.get('DataScannedInBytes', 0),
+        'cola_ms': estadisticas.get('QueryQueueTimeInMillis', 0),
+        'preprocesado_ms': estadisticas.get('ServicePreProcessingTimeInMillis', 0),
+        'motor_ms': estadisticas.get('EngineExecutionTimeInMillis', 0),
+        'total_ms': estadisticas.get('TotalExecutionTimeInMillis', 0),
+    }
+    entrada['coste_usd'] = coste_escaneo(entrada['bytes_escaneados']) if entrada['motor'] == 'athena' else 0.0
+
+    with _lock_historial:
+        _actualizar_referencias()
+        anteriores = list(_referencias['ejecuciones'].get((entrada['huella'], entrada['motor']), ()))
+        entrada['regresiones'] = detectar_regresiones(entrada, anteriores)
+        with open(historial_file, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+
+    for regresion in entrada['regresiones']:
+        print(
+            f"REGRESIÓN en la {descripcion} ({entrada['huella']}): {regresion['metrica']} = {regresion['valor']} "
+            f"frente a una mediana de {regresion['referencia']:.0f} en las ejecuciones anteriores"
+        )
+    return entrada
+
+
+def _tendencia(valores):
+    """Cambio relativo entre la primera y la segunda mitad de una serie"""
+    if len(valores) < 4:
+        return None
+    mitad = len(valores) // 2
+    antes = statistics.mean(valores[:mitad])
+    despues = statistics.mean(valores[mitad:])
+    return (despues - antes) / antes if antes else None
+
+
+def informe(huella=None):
+    """Resumen por huella: ejecuciones, escaneo, coste, cola frente a ejecución, tendencia y regresiones"""
+    grupos = {}
+    for entrada in leer_historial(huella):
+        grupos.setdefault((entrada['huella'], entrada['motor']), []).append(entrada)
+
+    resumen = []
+    for (huella_grupo, motor), entradas in grupos.items():
+        correctas = [e for e in entradas if e['estado'] == 'SUCCEEDED']
+        bytes_escaneados = [e['bytes_escaneados'] for e in correctas]
+        cola = sum(e['cola_ms'] for e in correctas)
+        motor_ms = sum(e['motor_ms'] for e in correctas)
+        resumen.append({
+            'huella': huella_grupo,
+            'motor': motor,
+            'descripcion': entradas[-1]['descripcion'],
+            'sql': entradas[-1]['sql'],
+            'ejecuciones': len(entradas),
+            'fallidas': len(entradas) - len(correctas),
+            'bytes_ultima': bytes_escaneados[-1] if bytes_escaneados else None,
+            'bytes_mediana': statistics.median(bytes_escaneados) if bytes_escaneados else None,
+            'coste_total_usd': sum(e['coste_usd'] for e in entradas),
+            'motor_ms_mediana': statistics.median(e['motor_ms'] for e in correctas) if correctas else None,
+            'cola_ms_mediana': statistics.median(e['cola_ms'] for e in correctas) if correctas else None,
+            'fraccion_cola': cola / (cola + motor_ms) if cola + motor_ms else None,
+            'tendencia_bytes': _tendencia(bytes_escaneados),
+            'tendencia_motor_ms': _tendencia([e['motor_ms'] for e in correctas]),
+            'regresiones': [r for e in entradas for r in e.get('regresiones', [])],
+            'ultima_ejecucion': entradas[-1]['fecha'],
+        })
+    return sorted(resumen, key=lambda r: r['coste_total_usd'], reverse=True)
+
+
+def _porcentaje(valor):
+    return f'{valor:+.0%}' if valor is not None else '-'
+
+
+def mostrar_informe(huella=None):
+    """Imprimir el informe del historial de consultas"""
+    filas = informe(huella)
+    if not filas:
+        print('No hay consultas en el historial.')
+        return filas
+    for fila in filas:
+        print(f"\n[{fila['huella']}] {fila['descripcion']} ({fila['motor']})")
+        print(f"  SQL: {fila['sql'][:120]}")
+        print(f"  Ejecuciones: {fila['ejecuciones']} ({fila['fallidas']} fallidas), última: {fila['ultima_ejecucion']}")
+        if fila['bytes_mediana'] is not None:
+            print(
+                f"  Escaneo: última {fila['bytes_ultima'] / 1024 ** 2:.2f} MiB, mediana {fila['bytes_mediana'] / 1024 ** 2:.2f} MiB, "
+                f"tendencia {_porcentaje(fila['tendencia_bytes'])}; coste total {fila['coste_total_usd']:.6f} USD"
+            )
+            fraccion = f"{fila['fraccion_cola']:.0%}" if fila['fraccion_cola'] is not None else '-'
+            print(
+                f"  Tiempo: motor {fila['motor_ms_mediana']:.0f} ms, cola {fila['cola_ms_mediana']:.0f} ms (mediana), "
+                f"{fraccion} del tiempo en cola, tendencia del motor {_porcentaje(fila['tendencia_motor_ms'])}"
+            )
+        for regresion in fila['regresiones']:
+            print(f"  REGRESIÓN: {regresion['metrica']} {regresion['valor']} frente a {regresion['referencia']:.0f}")
+    return filas
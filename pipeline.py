@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from archivos import escribir_json_atomico, sha256_archivo
+
+# --------------------------------
+# Flujo por etapas con checkpoints: cada etapa guarda la huella de sus
+# parámetros, archivos de entrada y salidas de las etapas de las que
+# depende. Si la huella no cambia (y sus archivos de salida siguen
+# intactos) la etapa se salta; si la ejecución se interrumpe, la
+# siguiente continúa desde la última etapa completada.
+# --------------------------------
+
+checkpoints_folder = './.checkpoints'
+
+
+def hash_valor(valor):
+    """SHA-256 de un valor serializable a JSON"""
+    return hashlib.sha256(json.dumps(valor, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class AlmacenCheckpoints:
+    def __init__(self, carpeta=checkpoints_folder, nombre='estado.json'):
+        self.ruta = os.path.join(carpeta, nombre)
+        self.carpeta = carpeta
+        self.estado = {}
+        if os.path.exists(self.ruta):
+            with open(self.ruta, 'r', encoding='utf-8') as file:
+                self.estado = json.load(file)
+
+    def obtener(self, etapa):
+        return self.estado.get(etapa)
+
+    def guardar(self, etapa, huella, salidas):
+        """Registrar una etapa completada (escritura atómica)"""
+        self.estado[etapa] = {
+            'huella': huella,
+            'salidas': salidas,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+        }
+        escribir_json_atomico(self.ruta, self.estado, indent=2, default=str)
+
+    def invalidar(self, etapa):
+        self.estado.pop(etapa, None)
+
+
+class Etapa:
+    def __init__(self, nombre, funcion, parametros=None, entradas=(), depende_de=()):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.parametros = parametros or {}
+        self.entradas = list(entradas)
+        self.depende_de = list(depende_de)
+
+
+class Pipeline:
+    def __init__(self, almacen=None):
+        self.almacen = almacen or AlmacenCheckpoints()
+        self.etapas = {}
+
+    def agregar(self, nombre, funcion, parametros=None, entradas=(), depende_de=()):
+        """Añadir una etapa; funcion(parametros, dependencias) devuelve un dict de salidas.
+
+        Si las salidas incluyen 'archivos' (ruta -> sha256), la etapa se
+        repite cuando alguno de esos archivos falta o ha cambiado.
+        """
+        for dependencia in depende_de:
+            if dependencia not in self.etapas:
+                raise ValueError(f"La etapa {nombre} depende de {dependencia}, que no existe.")
+        self.etapas[nombre] = Etapa(nombre, funcion, parametros, entradas, depende_de)
+
+    def _huella(self, etapa, salidas):
+        return hash_valor({
+            'parametros': etapa.parametros,
+            'entradas': {ruta: sha256_archivo(ruta) for ruta in etapa.entradas},
+            'dependencias': {dep: hash_valor(salidas[dep]) for dep in etapa.depende_de},
+        })
+
+    def _salidas_intactas(self, salidas):
+        for ruta, sha256 in salidas.get('archivos', {}).items():
+            if not os.path.exists(ruta) or sha256_archivo(ruta) != sha256:
+                return False
+        return True
+
+    def _necesarias(self, solo):
+        """Etapas pedidas y todas aquellas de las que dependen"""
+        necesarias = set()
+        pendientes = list(solo)
+        while pendientes:
+            nombre = pendientes.pop()
+            if nombre not in self.etapas:
+                raise ValueError(f"Etapa desconocida: {nombre}")
+            if nombre not in necesarias:
+                necesarias.add(nombre)
+                pendientes.extend(self.etapas[nombre].depende_de)
+        return necesarias
+
+    def ejecutar(self, solo=None, forzar=()):
+        """Ejecutar las etapas cuya huella ha cambiado y devolver las salidas de todas"""
+        necesarias = self._necesarias(solo) if solo else set(self.etapas)
+        salidas = {}
+        for nombre, etapa in self.etapas.items():
+            if nombre not in necesarias:
+                continue
+            huella = self._huella(etapa, salidas)
+            previo = self.almacen.obtener(nombre)
+            if (
+                previo
+                and previo['huella'] == huella
+                and nombre not in forzar
+                and self._salidas_intactas(previo['salidas'])
+            ):
+                print(f"[{nombre}] sin cambios, se reutiliza el checkpoint de {previo['fecha']}")
+                salidas[nombre] = previo['salidas']
+                continue
+
+            print(f"[{nombre}] ejecutando...")
+            dependencias = {dep: salidas[dep] for dep in etapa.depende_de}
+            resultado = etapa.funcion(etapa.parametros, dependencias) or {}
+            self.almacen.guardar(nombre, huella, resultado)
+            salidas[nombre] = resultado
+        return salidas
+
+
+# --------------------------------
+# Flujo de estudiantes: generar, subir, crear tablas y consultar
+# --------------------------------
+
+def _generar(parametros, dependencias):
+    from almacenamiento_s3 import guardar_datos_generados
+
+    # Un único lote generado y escrito en todos los formatos
+    archivos = guardar_datos_generados(
+        parametros['num_registros'], parametros['formatos'], parametros['semilla']
+    )
+    return {'archivos': {local_file: sha256_archivo(local_file) for local_file in archivos}}
+
+
+def _subir(formato):
+    def etapa(parametros, dependencias):
+        from almacenamiento_s3 import datos_folder, subir_archivo_generado
+
+        key = subir_archivo_generado(formato, parametros['bucket'])
+        if key is None:
+            raise RuntimeError(f"No hay datos generados en formato {formato} que subir.")
+        # La huella del contenido subido hace que las consultas se repitan si cambian los datos
+        local_file = os.path.join(datos_folder, f'datos_practicas.{formato}')
+        return {'key': key, 'sha256': sha256_archivo(local_file)}
+    return etapa
+
+
+def _subir_fuente(parametros, dependencias):
+    from almacenamiento_s3 import subir_fuente_json
+
+    subir_fuente_json(parametros['ruta'])
+    return {'sha256': sha256_archivo(parametros['ruta'])}
+
+
+def _crear_tabla(nombre_db, nombre_tabla, funcion_crear):
+    def etapa(parametros, dependencias):
+        import almacenamiento_s3
+
+        almacenamiento_s3.crear_base_datos(nombre_db)
+        almacenamiento_s3.eliminar_tabla(nombre_tabla, nombre_db)
+        getattr(almacenamiento_s3, funcion_crear)()
+        return {'tabla': f'{nombre_db}.{nombre_tabla}'}
+    return etapa
+
+
+def _consultar(descripcion):
+    def etapa(parametros, dependencias):
+        from almacenamiento_s3 import descargar_resultado_consulta
+        from consultas_locales import ejecutar_consulta
+
+        execution = ejecutar_consulta(parametros['sql'], descripcion)
+        if execution['Status']['State'] != 'SUCCEEDED':
+            raise RuntimeError(f"La {descripcion} terminó en estado {execution['Status']['State']}.")
+        local_file = descargar_resultado_consulta(execution)
+        return {
+            'query_execution_id': execution['QueryExecutionId'],
+            'archivos': {local_file: sha256_archivo(local_file)} if local_file else {},
+        }
+    return etapa
+
+
+def crear_pipeline_estudiantes(num_registros=100, semilla=42, almacen=None):
+    """Construir el flujo completo de estudiantes como etapas con checkpoint"""
+    import almacenamiento_s3 as s3
+
+    pipeline = Pipeline(almacen)
+    datos = {'num_registros': num_registros, 'semilla': semilla, 'formatos': ['csv', 'json']}
+
+    pipeline.agregar('generar', _generar, datos)
+    pipeline.agregar('subir_csv', _subir('csv'), {'bucket': s3.bucket_name}, depende_de=['generar'])
+    pipeline.agregar('subir_json', _subir('json'), {'bucket': s3.bucket_name}, depende_de=['generar'])
+    pipeline.agregar(
+        'subir_fuente_json', _subir_fuente, {'ruta': 'fuente_json.json'}, entradas=['fuente_json.json']
+    )
+
+    pipeline.agregar(
+        'tabla_csv', _crear_tabla(s3.database_name, s3.table_name, 'crear_tabla_csv'),
+        {'ddl': s3.CREATE_TABLE_CSV},
+    )
+    pipeline.agregar(
+        'tabla_json', _crear_tabla(s3.database_name, s3.table_name_json, 'crear_tabla_json'),
+        {'ddl': s3.CREATE_TABLE_JSON},
+    )
+    pipeline.agregar(
+        'tabla_fuentes_json', _crear_tabla(s3.db_name, s3.table_name_fuentes, 'crear_tabla_fuentes_json'),
+        {'ddl': s3.CREATE_TABLE_FUENTES_JSON},
+    )
+
+    # Cada consulta se repite solo si cambia su SQL, los datos o la tabla
+    for descripcion, sql in s3.CONSULTAS_CSV.items():
+        pipeline.agregar(
+            f'consulta:{descripcion}', _consultar(descripcion), {'sql': sql},
+            depende_de=['subir_csv', 'tabla_csv'],
+        )
+    for descripcion, sql in s3.CONSULTAS_FUENTES_JSON.items():
+        pipeline.agregar(
+            f'consulta:{descripcion}', _consultar(descripcion), {'sql': sql},
+            depende_de=['subir_fuente_json', 'tabla_fuentes_json'],
+        )
+    return pipeline
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from archivos import escribir_json_atomico, sha256_archivo
+from clientes import obtener_cliente
+from control_ritmo import clave_s3, ejecutar
+
+# --------------------------------
+# Subidas direccionadas por contenido: antes de enviar se calcula el
+# SHA-256 del contenido y se omite la subida si el destino ya tiene un
+# objeto con la misma huella en sus metadatos (una llamada head_object).
+# Cuando los mismos bytes van a varios destinos se suben una sola vez y se
+# replican con copy_object en el servidor, en paralelo. El manifiesto local
+# recuerda dónde está ya cada contenido para usarlo como origen de copias;
+# el origen se comprueba antes de copiar y la copia exige su ETag.
+# --------------------------------
+
+manifiesto_file = './.manifiesto_subidas.json'
+
+# Clases desde las que S3 no permite copiar sin restaurar antes el objeto
+CLASES_ARCHIVO = ('GLACIER', 'DEEP_ARCHIVE')
+# Por encima de 5 GiB copy_object no sirve y hay que copiar por partes
+LIMITE_COPY_OBJECT = 5 * 1024 ** 3
+
+_lock_manifiesto = threading.Lock()
+
+
+def _leer_manifiesto():
+    """Leer el manifiesto local de objetos subidos"""
+    if not os.path.exists(manifiesto_file):
+        return {}
+    with open(manifiesto_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _actualizar_manifiesto(bucket, key, entrada=None):
+    """Registrar (o borrar, si entrada es None) un objeto en el manifiesto local"""
+    with _lock_manifiesto:
+        manifiesto = _leer_manifiesto()
+        if entrada is None:
+            manifiesto.pop(f'{bucket}/{key}', None)
+        else:
+            manifiesto[f'{bucket}/{key}'] = entrada
+        escribir_json_atomico(manifiesto_file, manifiesto, indent=2)
+
+
+def codigo_error(error):
+    """Código de error de una excepción de botocore (None si no lo tiene)"""
+    return (getattr(error, 'response', None) or {}).get('Error', {}).get('Code')
+
+
+def no_existe(error):
+    """Indicar si una excepción de botocore es un 404 del objeto"""
+    return codigo_error(error) in ('404', 'NoSuchKey', 'NotFound')
+
+
+def precondicion_fallida(error):
+    """Indicar si una petición condicional (IfMatch, CopySourceIfMatch) no se cumplió"""
+    return codigo_error(error) in ('412', 'PreconditionFailed')
+
+
+def _origen_cambiado(error):
+    """Indicar si una copia falló porque el origen ya no existe o cambió de ETag"""
+    return no_existe(error) or precondicion_fallida(error)
+
+
+def olvidar_bucket(bucket):
+    """Borrar del manifiesto local los objetos de un bucket (por ejemplo al eliminarlo)"""
+    with _lock_manifiesto:
+        manifiesto = _leer_manifiesto()
+        restantes = {ruta: entrada for ruta, entrada in manifiesto.items() if not ruta.startswith(f'{bucket}/')}
+        if len(restantes) == len(manifiesto):
+            return
+        escribir_json_atomico(manifiesto_file, restantes, indent=2)
+
+
+def _normalizar(destino):
+    """Destino como (bucket, key, clase de almacenamiento)"""
+    bucket, key, *resto = destino
+    return bucket, key, (resto[0] if resto and resto[0] else 'STANDARD')
+
+
+def hash_contenido(contenido):
+    """SHA-256, tamaño y bytes de un contenido en memoria"""
+    if isinstance(contenido, str):
+        contenido = contenido.encode('utf-8')
+    return hashlib.sha256(contenido).hexdigest(), len(contenido), contenido
+
+
+def hash_archivo(ruta):
+    """SHA-256 y tamaño de un archivo local"""
+    return sha256_archivo(ruta), os.path.getsize(ruta)
+
+
+def _cabecera(bucket, key):
+    """head_object del objeto, o None si no existe"""
+    try:
+        return ejecutar(clave_s3(bucket, key), obtener_cliente('s3').head_object, Bucket=bucket, Key=key)
+    except Exception as e:
+        if no_existe(e):
+            return None
+        raise
+
+
+def _ya_subido(destino, sha256, manifiesto):
+    """Indicar si el destino ya guarda estos bytes con la clase pedida.
+
+    Siempre se pregunta a S3: el manifiesto no sabe si el objeto se borró,
+    caducó o se sobrescribió fuera de esta herramienta.
+    """
+    bucket, key, clase = destino
+    cabecera = _cabecera(bucket, key)
+    remoto = None
+    if cabecera is not None and cabecera.get('Metadata', {}).get('sha256'):
+        remoto = {
+            'sha256': cabecera['Metadata']['sha256'],
+            'clase': cabecera.get('StorageClass', 'STANDARD'),
+            'tamano': cabecera['ContentLength'],
+        }
+    if manifiesto.get(f'{bucket}/{key}') != remoto:
+        _actualizar_manifiesto(bucket, key, remoto)
+        if remoto is None:
+            manifiesto.pop(f'{bucket}/{key}', None)
+        else:
+            manifiesto[f'{bucket}/{key}'] = remoto
+    return remoto is not None and remoto['sha256'] == sha256 and remoto['clase'] == clase
+
+
+def _origen_conocido(sha256, manifiesto):
+    """Objeto del manifiesto con el mismo contenido que aún lo guarda: ((bucket, key), cabecera)"""
+    for ruta, entrada in list(manifiesto.items()):
+        if entrada['sha256'] == sha256 and entrada['clase'] not in CLASES_ARCHIVO:
+            bucket, key = ruta.split('/', 1)
+            cabecera = _cabecera(bucket, key)
+            if (
+                cabecera is not None
+                and cabecera.get('Metadata', {}).get('sha256') == sha256
+                and cabecera.get('StorageClass', 'STANDARD') not in CLASES_ARCHIVO
+            ):
+                return (bucket, key), cabecera
+            # La entrada está obsoleta: el objeto se borró o ya tiene otro contenido
+            _actualizar_manifiesto(bucket, key)
+            manifiesto.pop(ruta)
+    return None, None
+
+
+def _copiar(origen, cabecera_origen, destino, sha256, tamano):
+    """Copia en el servidor conservando la huella y el tipo de contenido"""
+    bucket, key, clase = destino
+    s3_client = obtener_cliente('s3')
+    copy_source = {'Bucket': origen[0], 'Key': origen[1]}
+    # Con REPLACE se pierden los metadatos del origen: se repiten la huella y el ContentType
+    extra = {
+        'StorageClass': clase,
+        'Metadata': {'sha256': sha256},
+        'MetadataDirective': 'REPLACE',
+        'CopySourceIfMatch': cabecera_origen['ETag'],
+    }
+    if cabecera_origen.get('ContentType'):
+        extra['ContentType'] = cabecera_origen['ContentType']
+    if tamano > LIMITE_COPY_OBJECT:
+        ejecutar(clave_s3(bucket, key), s3_client.copy, copy_source, bucket, key, ExtraArgs=extra)
+    else:
+        ejecutar(clave_s3(bucket, key), s3_client.copy_object, CopySource=copy_source, Bucket=bucket, Key=key, **extra)
+    _actualizar_manifiesto(bucket, key, {'sha256': sha256, 'clase': clase, 'tamano': tamano})
+
+
+def _distribuir(sha256, tamano, destinos, subir, max_workers=8):
+    """Subir una vez y replicar con copias en el servidor a los destinos que lo necesiten"""
+    destinos = [_normalizar(destino) for destino in destinos]
+    manifiesto = _leer_manifiesto()
+    resultado = {}
+    pendientes = []
+    for destino in destinos:
+        if _ya_subido(destino, sha256, manifiesto):
+            resultado[destino[:2]] = 'omitido'
+            print(f'Sin cambios: s3://{destino[0]}/{destino[1]} ya tiene este contenido.')
+        else:
+            pendientes.append(destino)
+    if not pendientes:
+        return resultado
+
+    def subir_directo(destino):
+        subir(destino)
+        _actualizar_manifiesto(destino[0], destino[1], {'sha256': sha256, 'clase': destino[2], 'tamano': tamano})
+        return 'subido'
+
+    origen, cabecera_origen = _origen_conocido(sha256, manifiesto)
+    if origen is None:
+        # Subir al primer destino desde el que luego se pueda copiar
+        primero = next((d for d in pendientes if d[2] not in CLASES_ARCHIVO), pendientes[0])
+        pendientes.remove(primero)
+        resultado[primero[:2]] = subir_directo(primero)
+        print(f'Subido: s3://{primero[0]}/{primero[1]} ({tamano} bytes, {primero[2]}).')
+        if primero[2] not in CLASES_ARCHIVO and pendientes:
+            origen = primero[:2]
+            cabecera_origen = _cabecera(*origen)
+
+    def replicar(destino):
+        if origen is None or cabecera_origen is None:
+            return subir_directo(destino)
+        try:
+            _copiar(origen, cabecera_origen, destino, sha256, tamano)
+        except Exception as e:
+            if not _origen_cambiado(e):
+                raise
+            # El origen se borró o cambió después de comprobarlo: se sube directamente
+            _actualizar_manifiesto(*origen)
+            return subir_directo(destino)
+        return 'copiado'
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for destino, estado in zip(pendientes, executor.map(replicar, pendientes)):
+            resultado[destino[:2]] = estado
+            print(f'{estado.capitalize()}: s3://{destino[0]}/{destino[1]} ({destino[2]}).')
+    return resultado
+
+
+def subir_contenido(contenido, destinos, max_workers=8):
+    """Subir unos bytes (o texto) a uno o varios destinos (bucket, key[, clase]) sin duplicar envíos"""
+    sha256, tamano, datos = hash_contenido(contenido)
+
+    def subir(destino):
+        bucket, key, clase = destino
+        ejecutar(
+            clave_s3(bucket, key), obtener_cliente('s3').put_object,
+            Bucket=bucket, Key=key, Body=datos, StorageClass=clase, Metadata={'sha256': sha256},
+        )
+
+    return _distribuir(sha256, tamano, destinos, subir, max_workers)
+
+
+def subir_archivo(ruta, destinos, max_workers=8):
+    """Subir un archivo local a uno o varios destinos (bucket, key[, clase]) sin duplicar envíos"""
+    sha256, tamano = hash_archivo(ruta)
+
+    def subir(destino):
+        bucket, key, clase = destino
+        ejecutar(
+            clave_s3(bucket, key), obtener_cliente('s3').upload_file, ruta, bucket, key,
+            ExtraArgs={'StorageClass': clase, 'Metadata': {'sha256': sha256}},
+        )
+
+    return _distribuir(sha256, tamano, destinos, subir, max_workers)